@@ -0,0 +1,209 @@
+# benchmarks/common.py
+"""
+Shared helpers for the benchmark scripts: database selection, data seeding,
+latency summaries and machine-readable JSON reports.
+
+Benchmarks always run against a dedicated database (MONGO_DB_NAME, default
+"inventory_bench") that is dropped and re-seeded, never the app database.
+"""
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+BENCH_DB_NAME = "inventory_bench"
+BENCH_PASSWORD = "bench-password"
+
+
+# -------------------
+# Environment
+# -------------------
+def configure_environment(db_name: str = BENCH_DB_NAME) -> None:
+    """
+    Point the app at the benchmark database. Must run before importing `db` or `main`.
+
+    The app needs a real replica set (order transactions, causally consistent
+    sessions, the capped events collection), so there is no in-process stand-in.
+    """
+    os.environ["MONGO_DB_NAME"] = db_name
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+# -------------------
+# Seeding
+# -------------------
+async def seed(
+    db,
+    products: int = 1000,
+    orders: int = 5000,
+    categories: int = 20,
+    users: int = 10,
+    days: int = 365,
+) -> Dict[str, list]:
+    """Drop and fill the benchmark database. Returns handles the traffic generators need."""
+    from core.security import hash_password
+    from core.indexes import ensure_indexes
+    from services import product_search, sales_rollup
+
+    for name in await db.list_collection_names():
+        await db.drop_collection(name)
+    await ensure_indexes(db)
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    hashed = hash_password(BENCH_PASSWORD)
+
+    user_docs = [{
+        "id": str(uuid.uuid4()),
+        "username": f"bench{i}",
+        "hashed_password": hashed,
+        "role": "owner" if i == 0 else "employee",
+        "is_active": True,
+    } for i in range(users)]
+    if user_docs:
+        await db["users"].insert_many(user_docs)
+
+    category_docs = [{
+        "id": str(uuid.uuid4()),
+        "name": f"Category {i}",
+        "description": None,
+        "created_at": now,
+        "updated_at": None,
+    } for i in range(categories)]
+    if category_docs:
+        await db["categories"].insert_many(category_docs)
+
+    words = ["cola", "chips", "bread", "milk", "soap", "rice", "coffee", "sugar", "noodles", "juice"]
+    product_docs = []
+    for i in range(products):
+        name = f"{rng.choice(words).title()} {rng.choice(words)} {i}"
+        description = f"{rng.choice(words)} {rng.choice(words)} pack"
+        doc = {
+            "id": str(uuid.uuid4()),
+            "name": name,
+            "description": description,
+            "price": round(rng.uniform(5, 500), 2),
+            "stock": 1_000_000,
+            "is_active": True,
+            "category_id": rng.choice(category_docs)["id"],
+            "created_at": now - timedelta(days=rng.randint(0, days)),
+            "updated_at": None,
+        }
+        doc.update(product_search.build_search_fields(name, description))
+        product_docs.append(doc)
+    for start in range(0, len(product_docs), 1000):
+        await db["products"].insert_many(product_docs[start:start + 1000])
+
+    batch = []
+    for _ in range(orders):
+        lines = rng.sample(product_docs, k=min(len(product_docs), rng.randint(1, 5)))
+        items = []
+        for p in lines:
+            qty = rng.randint(1, 3)
+            items.append({
+                "product_id": p["id"],
+                "product_name": p["name"],
+                "quantity": qty,
+                "price": p["price"],
+                "subtotal": p["price"] * qty,
+            })
+        user = rng.choice(user_docs)
+        batch.append({
+            "id": str(uuid.uuid4()),
+            "customer_name": "Walk-in",
+            "items": items,
+            "total": sum(i["subtotal"] for i in items),
+            "created_at": now - timedelta(minutes=rng.randint(0, days * 24 * 60)),
+            "created_by_id": user["id"],
+            "created_by_username": user["username"],
+            "status": "completed",
+        })
+        if len(batch) == 1000:
+            await db["orders"].insert_many(batch)
+            batch = []
+    if batch:
+        await db["orders"].insert_many(batch)
+    if orders:
+        await sales_rollup.rebuild()
+
+    return {
+        "users": [u["username"] for u in user_docs],
+        "product_ids": [p["id"] for p in product_docs],
+        "search_terms": words,
+    }
+
+
+# -------------------
+# Reporting
+# -------------------
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples: List[float], errors: int = 0, elapsed: Optional[float] = None) -> Dict[str, float]:
+    """Latency summary in milliseconds (samples are seconds)."""
+    values = sorted(s * 1000 for s in samples)
+    summary = {
+        "count": len(values),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(values), 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3) if values else 0.0,
+    }
+    if elapsed:
+        summary["throughput_rps"] = round(len(values) / elapsed, 2)
+    return summary
+
+
+def write_report(name: str, params: dict, results: dict, output: Optional[str] = None) -> dict:
+    """Print the report as JSON (and write it to `output` when given)."""
+    report = {
+        "benchmark": name,
+        "revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": sys.version.split()[0],
+        "params": params,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if output:
+        Path(output).write_text(text + "\n")
+    print(text)
+    return report
+
+
+class Timer:
+    """with Timer() as t: ...; t.elapsed -> seconds"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        return False
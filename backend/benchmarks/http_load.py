@@ -0,0 +1,173 @@
+# benchmarks/http_load.py
+"""
+Mixed-traffic HTTP load benchmark for the FastAPI app.
+
+Seeds a dedicated benchmark database, starts `main.app` in-process (httpx
+ASGITransport, no network) or targets a running server with --url, then drives
+a weighted mix of requests at a fixed concurrency and reports p50/p95/p99
+latency and throughput per route as JSON.
+
+    cd backend
+    python -m benchmarks.http_load --concurrency 32 --duration 30 --output bench.json
+    python -m benchmarks.http_load --no-reports --duration 10
+
+With --url the server must use the same database (MONGO_DB_NAME=inventory_bench).
+Requires httpx and a mongod running as a replica set (order transactions). Compare runs across commits by diffing the JSON output.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+
+from benchmarks.common import (
+    BENCH_DB_NAME, BENCH_PASSWORD, configure_environment, seed, summarize, write_report,
+)
+
+# route name -> relative weight
+DEFAULT_MIX = {
+    "login": 5,
+    "list_products_search": 40,
+    "create_order": 20,
+    "dashboard": 25,
+    "report_inventory_pdf": 5,
+    "report_sales_pdf": 5,
+}
+
+
+class Traffic:
+    def __init__(self, client, seeded: dict, rng: random.Random, tokens: dict):
+        self.client = client
+        self.seeded = seeded
+        self.rng = rng
+        self.tokens = tokens
+
+    async def token(self, username: str) -> str:
+        if username not in self.tokens:
+            resp = await self.client.post("/auth/login", data={"username": username, "password": BENCH_PASSWORD})
+            resp.raise_for_status()
+            self.tokens[username] = resp.json()["access_token"]
+        return self.tokens[username]
+
+    async def auth(self, owner: bool = False) -> dict:
+        users = self.seeded["users"]
+        username = users[0] if owner else self.rng.choice(users)
+        return {"Authorization": f"Bearer {await self.token(username)}"}
+
+    # Request generators: each returns an httpx.Response
+    async def login(self):
+        username = self.rng.choice(self.seeded["users"])
+        return await self.client.post("/auth/login", data={"username": username, "password": BENCH_PASSWORD})
+
+    async def list_products_search(self):
+        term = self.rng.choice(self.seeded["search_terms"])
+        prefix = term[: self.rng.randint(2, len(term))]
+        return await self.client.get("/products/", params={"search": prefix, "limit": 25})
+
+    async def create_order(self):
+        product_ids = self.rng.sample(self.seeded["product_ids"], k=self.rng.randint(1, 5))
+        payload = {
+            "customer_name": "Bench customer",
+            "items": [{"product_id": pid, "quantity": 1} for pid in product_ids],
+        }
+        return await self.client.post("/orders/", json=payload, headers=await self.auth())
+
+    async def dashboard(self):
+        period = self.rng.choice(["week", "month", "year", "all"])
+        return await self.client.get("/dashboard/", params={"period": period}, headers=await self.auth(owner=True))
+
+    async def report_inventory_pdf(self):
+        return await self.client.get("/reports/inventory/pdf", headers=await self.auth(owner=True))
+
+    async def report_sales_pdf(self):
+        return await self.client.get("/reports/sales/pdf", headers=await self.auth(owner=True))
+
+
+async def run_load(client, seeded: dict, mix: dict, concurrency: int, duration: float, seed_value: int):
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    routes = list(mix)
+    weights = [mix[r] for r in routes]
+
+    # Log every user in up front so token acquisition is not billed to other routes
+    tokens = {}
+    warmup = Traffic(client, seeded, random.Random(seed_value), tokens)
+    for username in seeded["users"]:
+        await warmup.token(username)
+
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_id: int):
+        traffic = Traffic(client, seeded, random.Random(seed_value + worker_id), tokens)
+        while time.perf_counter() < deadline:
+            route = traffic.rng.choices(routes, weights)[0]
+            start = time.perf_counter()
+            try:
+                resp = await getattr(traffic, route)()
+                ok = resp.status_code < 400
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+            if ok:
+                samples[route].append(elapsed)
+            else:
+                errors[route] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    results = {route: summarize(samples[route], errors[route], wall) for route in routes}
+    all_samples = [s for route in routes for s in samples[route]]
+    results["_total"] = summarize(all_samples, sum(errors.values()), wall)
+    return results
+
+
+async def main(args):
+    import httpx
+
+    configure_environment(args.db_name)
+    from db import db
+
+    seeded = await seed(db, products=args.products, orders=args.orders,
+                        categories=args.categories, users=args.users)
+
+    mix = dict(DEFAULT_MIX)
+    if args.no_reports:
+        mix.pop("report_inventory_pdf")
+        mix.pop("report_sales_pdf")
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+            results = await run_load(client, seeded, mix, args.concurrency, args.duration, args.seed)
+    else:
+        from main import app
+
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+                results = await run_load(client, seeded, mix, args.concurrency, args.duration, args.seed)
+
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    params["mix"] = mix
+    write_report("http_load", params, results, args.output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--db-name", default=BENCH_DB_NAME)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-reports", action="store_true", help="Leave the PDF endpoints out of the mix")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
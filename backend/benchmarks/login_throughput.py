@@ -0,0 +1,94 @@
+# benchmarks/login_throughput.py
+"""
+Login throughput benchmark.
+
+Fires `--logins` POST /auth/login requests at a fixed concurrency against the
+in-process app while a ticker coroutine measures event-loop lag. With hashing
+off the loop, lag stays near zero and other requests keep being served while
+bcrypt runs.
+
+    cd backend
+    python -m benchmarks.login_throughput --logins 200 --concurrency 50
+    BCRYPT_ROUNDS=10 python -m benchmarks.login_throughput   # compare costs
+
+Requires httpx and a local mongod running as a replica set.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import (
+    BENCH_DB_NAME, BENCH_PASSWORD, configure_environment, seed, summarize, write_report,
+)
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> list:
+    """Sample how late the loop wakes a sleeping coroutine."""
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - start - interval))
+    return lags
+
+
+async def main(args):
+    import httpx
+
+    configure_environment(args.db_name)
+    from db import db
+    from core.config import settings
+    from main import app
+
+    seeded = await seed(db, products=0, orders=0, categories=0, users=args.users)
+    usernames = seeded["users"]
+
+    samples, errors = [], 0
+    queue = asyncio.Queue()
+    for i in range(args.logins):
+        queue.put_nowait(usernames[i % len(usernames)])
+
+    async def worker(client):
+        nonlocal errors
+        while not queue.empty():
+            username = queue.get_nowait()
+            start = time.perf_counter()
+            resp = await client.post("/auth/login", data={"username": username, "password": BENCH_PASSWORD})
+            if resp.status_code == 200:
+                samples.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            stop = asyncio.Event()
+            lag_task = asyncio.create_task(measure_loop_lag(stop))
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+            wall = time.perf_counter() - started
+            stop.set()
+            lags = await lag_task
+
+    results = {
+        "login": summarize(samples, errors, wall),
+        "event_loop_lag": summarize(lags),
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        "hash_workers": settings.PASSWORD_HASH_WORKERS,
+    }
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    write_report("login_throughput", params, results, args.output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-name", default=BENCH_DB_NAME)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
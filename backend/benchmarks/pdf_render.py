@@ -0,0 +1,112 @@
+# benchmarks/pdf_render.py
+"""
+Per-report PDF overhead: a generator per call versus the process-wide one
+(no database needed; runs in-process, like a render worker).
+
+    fresh          - PDFGenerator() per report, no bytecode cache: what the
+                     convenience wrappers used to do (new Jinja environment,
+                     template compile, logo lookup, CSS parse and font load)
+    fresh_bytecode - PDFGenerator() per report with the on-disk bytecode
+                     cache: the cost a newly started render process pays
+    shared         - get_generator(), reused for every report
+
+    cd backend
+    python -m benchmarks.pdf_render --kind inventory --rows 200 --repeat 20
+
+Needs WeasyPrint and Jinja2. The stylesheets @import web fonts, so the
+first "fresh" runs also include that network fetch unless it is cached.
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import summarize, write_report
+
+
+def make_orders(n: int) -> list:
+    now = datetime.utcnow()
+    return [{
+        "customer_name": f"Customer {i}",
+        "created_at": now - timedelta(hours=i),
+        "items": [{"product_id": "p", "quantity": 1}] * (1 + i % 4),
+        "status": ("completed", "pending", "cancelled")[i % 3],
+        "total": 125.5 + i,
+    } for i in range(n)]
+
+
+def make_products(n: int) -> list:
+    return [{
+        "name": f"Product {i}",
+        "description": "A reasonably sized product description",
+        "price": 10.5 + i,
+        "stock": i % 40,
+        "reorder_level": 10,
+        "is_active": i % 7 != 0,
+    } for i in range(n)]
+
+
+def run_mode(mode: str, kind: str, rows: list, repeat: int) -> dict:
+    from core.config import settings
+    from utils import pdf_utils
+
+    bytecode_dir = settings.PDF_TEMPLATE_CACHE_DIR
+    if mode == "fresh":
+        settings.PDF_TEMPLATE_CACHE_DIR = ""
+    try:
+        if mode == "shared":
+            pdf_utils.get_generator()  # built once, outside the timed loop, like a warmed worker
+
+        construct, total = [], []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            generator = pdf_utils.get_generator() if mode == "shared" else pdf_utils.PDFGenerator()
+            built = time.perf_counter()
+            if kind == "sales":
+                generator.generate_sales_report(rows, company_name="Bench", logo_url="logo.png")
+            else:
+                generator.generate_inventory_report(rows, company_name="Bench", logo_url="logo.png")
+            finished = time.perf_counter()
+            construct.append(built - started)
+            total.append(finished - started)
+    finally:
+        settings.PDF_TEMPLATE_CACHE_DIR = bytecode_dir
+
+    return {"construct": summarize(construct), "report": summarize(total)}
+
+
+def main(args):
+    from core.config import settings
+
+    # A private bytecode cache, so earlier runs or the app's cache don't skew "fresh_bytecode"
+    settings.PDF_TEMPLATE_CACHE_DIR = tempfile.mkdtemp(prefix="pdf_bench_bytecode_")
+
+    rows = make_orders(args.rows) if args.kind == "sales" else make_products(args.rows)
+    results = {}
+    for mode in args.modes:
+        results[mode] = run_mode(mode, args.kind, rows, args.repeat)
+
+    if "fresh" in results and "shared" in results:
+        before = results["fresh"]["report"]["p50_ms"]
+        after = results["shared"]["report"]["p50_ms"]
+        results["saved_per_report_ms"] = round(before - after, 3)
+
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    params["cpu_count"] = os.cpu_count()
+    write_report("pdf_render", params, results, args.output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kind", choices=["sales", "inventory"], default="inventory")
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--modes", nargs="*", default=["fresh", "fresh_bytecode", "shared"],
+                        choices=["fresh", "fresh_bytecode", "shared"])
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,86 @@
+# benchmarks/serialization.py
+"""
+Serialization micro-benchmark for list endpoints (no database needed).
+
+Compares, for a page of N product documents:
+    legacy  - ProductOut(**doc) per item, re-validated through the response_model
+              field and encoded with jsonable_encoder + json.dumps (FastAPI default path)
+    adapter - one TypeAdapter(List[ProductOut]) validation + orjson (utils/serialization.py)
+    sparse  - same as adapter with fields=id,name,price
+
+    cd backend
+    python -m benchmarks.serialization --items 200 --repeat 200
+"""
+import argparse
+import json
+import timeit
+import uuid
+from datetime import datetime
+from typing import List
+
+from benchmarks.common import summarize, write_report
+
+
+def make_docs(n: int) -> list:
+    now = datetime.utcnow()
+    return [{
+        "id": str(uuid.uuid4()),
+        "name": f"Product {i}",
+        "description": "A reasonably sized product description " * 3,
+        "price": 10.5 + i,
+        "stock": i,
+        "is_active": True,
+        "category_id": str(uuid.uuid4()),
+        "created_at": now,
+        "updated_at": None,
+    } for i in range(n)]
+
+
+def main(args):
+    import orjson
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from models.product import ProductOut
+    from utils.serialization import list_adapter
+
+    docs = make_docs(args.items)
+    response_adapter = TypeAdapter(List[ProductOut])
+
+    def legacy():
+        items = [ProductOut(**d) for d in docs]
+        # FastAPI validates the returned models again through response_model
+        validated = response_adapter.validate_python([i.model_dump() for i in items])
+        return json.dumps(jsonable_encoder(validated)).encode()
+
+    def adapter():
+        a = list_adapter(ProductOut)
+        return orjson.dumps(a.dump_python(a.validate_python(docs), mode="json"))
+
+    selected = ("id", "name", "price")
+
+    def sparse():
+        a = list_adapter(ProductOut, selected)
+        sparse_docs = [{k: d[k] for k in selected} for d in docs]
+        return orjson.dumps(a.dump_python(a.validate_python(sparse_docs), mode="json"))
+
+    results = {}
+    for name, fn in (("legacy", legacy), ("adapter", adapter), ("sparse", sparse)):
+        fn()  # warm caches
+        times = timeit.repeat(fn, number=1, repeat=args.repeat)
+        results[name] = summarize(times)
+        results[name]["bytes"] = len(fn())
+    results["speedup_p50"] = round(results["legacy"]["p50_ms"] / max(results["adapter"]["p50_ms"], 1e-9), 2)
+
+    write_report("serialization", {"items": args.items, "repeat": args.repeat}, results, args.output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,146 @@
+# benchmarks/startup.py
+"""
+API cold-start: import time of main:app and time-to-first-request.
+
+    import  - `import main` in a fresh interpreter, --repeat times (median
+              reported), plus whether the PDF stack (weasyprint and its
+              cairo/font libraries) was loaded and the slowest top-level
+              imports from `-X importtime`
+    serve   - starts `serve.py --workers 1` --repeat times and measures the
+              time until /metrics answers (time-to-first-request) and the
+              latency of that first request
+
+    cd backend
+    python -m benchmarks.startup --repeat 5
+    python -m benchmarks.startup --skip-serve          # no mongod needed
+
+The serve phase needs a running mongod and httpx. Run it with and without
+--pdf-warmup to check that warming the render processes stays off the
+startup path.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import BACKEND_DIR, BENCH_DB_NAME, write_report
+from benchmarks.worker_scaling import start_server, stop_server
+
+# jinja2 is not listed: fastapi_cache.coder imports starlette.templating, which
+# imports it, so API workers load it whatever pdf_utils does
+HEAVY_MODULES = ("weasyprint", "cairocffi", "pydyf", "fontTools")
+
+_IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"import_s": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def _env(db_name: str) -> dict:
+    env = dict(os.environ)
+    env["MONGO_DB_NAME"] = db_name
+    return env
+
+
+def measure_import(db_name: str) -> dict:
+    out = subprocess.check_output([sys.executable, "-c", _IMPORT_PROBE], cwd=BACKEND_DIR, env=_env(db_name), text=True)
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def top_imports(db_name: str, limit: int) -> list:
+    """Slowest top-level packages by cumulative import time (microseconds)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=_env(db_name), text=True, capture_output=True, check=True,
+    )
+    totals = {}
+    for line in proc.stderr.splitlines():
+        # "import time:      self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith(" " * 2):  # nested import, already counted by its parent
+            continue
+        totals[name.strip()] = int(cumulative)
+    slowest = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+    return [{"module": name, "cumulative_ms": round(us / 1000, 3)} for name, us in slowest]
+
+
+async def measure_serve(args) -> dict:
+    import httpx
+
+    started = time.perf_counter()
+    process = start_server(1, args.port, args.db_name, args.pdf_warmup)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=5) as client:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"Server exited with code {process.returncode}")
+                if time.perf_counter() - started > args.ready_timeout:
+                    raise TimeoutError("Server did not become ready")
+                request_started = time.perf_counter()
+                try:
+                    resp = await client.get("/metrics")
+                except httpx.TransportError:
+                    await asyncio.sleep(0.02)
+                    continue
+                if resp.status_code == 200:
+                    now = time.perf_counter()
+                    return {"first_request_s": now - started, "first_request_ms": (now - request_started) * 1000}
+                await asyncio.sleep(0.02)
+    finally:
+        stop_server(process)
+
+
+def median(values: list) -> float:
+    return round(statistics.median(values), 4) if values else 0.0
+
+
+def main(args):
+    results = {}
+
+    imports = [measure_import(args.db_name) for _ in range(args.repeat)]
+    results["import"] = {
+        "median_s": median([r["import_s"] for r in imports]),
+        "min_s": round(min(r["import_s"] for r in imports), 4),
+        "heavy_modules_loaded": imports[-1]["loaded"],
+        "top_imports": top_imports(args.db_name, args.top),
+    }
+    print(f"import main: {results['import']['median_s']}s, heavy modules loaded: "
+          f"{results['import']['heavy_modules_loaded'] or 'none'}", file=sys.stderr)
+
+    if not args.skip_serve:
+        runs = [asyncio.run(measure_serve(args)) for _ in range(args.repeat)]
+        results["serve"] = {
+            "time_to_first_request_median_s": median([r["first_request_s"] for r in runs]),
+            "time_to_first_request_max_s": round(max(r["first_request_s"] for r in runs), 4),
+            "first_request_median_ms": median([r["first_request_ms"] for r in runs]),
+        }
+        print(f"time to first request: {results['serve']['time_to_first_request_median_s']}s", file=sys.stderr)
+
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    write_report("startup", params, results, args.output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-name", default=BENCH_DB_NAME)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="How many of the slowest imports to list")
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--ready-timeout", type=float, default=60.0)
+    parser.add_argument("--pdf-warmup", action="store_true", help="Start the server with PDF_WARMUP=true")
+    parser.add_argument("--skip-serve", action="store_true", help="Only measure imports (no mongod needed)")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
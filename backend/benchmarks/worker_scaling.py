@@ -0,0 +1,139 @@
+# benchmarks/worker_scaling.py
+"""
+Throughput scaling from 1 to N API workers.
+
+Seeds the benchmark database once, then for each worker count starts
+`serve.py --workers n` on a local port, waits until it answers
+(time-to-ready is reported), drives the http_load traffic mix against it for
+--duration seconds and stops it with SIGTERM (graceful drain). Reports
+throughput and latency per worker count plus scaling efficiency
+(rps(n) / (n * rps(1))).
+
+    cd backend
+    python -m benchmarks.worker_scaling --max-workers 8 --concurrency 64 --duration 20
+
+Needs a running mongod (replica set, for order transactions) and httpx.
+PDF endpoints are left out of the mix unless --with-reports is given.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from benchmarks.common import BACKEND_DIR, BENCH_DB_NAME, configure_environment, seed, write_report
+from benchmarks.http_load import DEFAULT_MIX, run_load
+
+
+async def wait_until_ready(client, process: subprocess.Popen, timeout: float) -> float:
+    """Seconds until the server answers /metrics (workers only accept after their lifespan startup)."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            resp = await client.get("/metrics")
+            if resp.status_code == 200:
+                return time.perf_counter() - started
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+    raise TimeoutError("Server did not become ready")
+
+
+def start_server(workers: int, port: int, db_name: str, pdf_warmup: bool) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "MONGO_DB_NAME": db_name,
+        "STOCK_CHECKPOINT_INTERVAL_SECONDS": "0",
+        "PDF_WARMUP": "true" if pdf_warmup else "false",
+    })
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+def stop_server(process: subprocess.Popen, timeout: float = 60) -> float:
+    """SIGTERM and wait; returns the drain time in seconds."""
+    started = time.perf_counter()
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    return time.perf_counter() - started
+
+
+async def main(args):
+    import httpx
+
+    configure_environment(args.db_name)
+    from db import db
+
+    seeded = await seed(db, products=args.products, orders=args.orders,
+                        categories=args.categories, users=args.users)
+
+    mix = dict(DEFAULT_MIX)
+    if not args.with_reports:
+        mix.pop("report_inventory_pdf")
+        mix.pop("report_sales_pdf")
+
+    counts = args.workers or list(range(1, args.max_workers + 1))
+    results = {}
+    for n in counts:
+        process = start_server(n, args.port, args.db_name, args.with_reports)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=120) as client:
+                ready_s = await wait_until_ready(client, process, args.ready_timeout)
+                load = await run_load(client, seeded, mix, args.concurrency, args.duration, args.seed)
+        finally:
+            drain_s = stop_server(process)
+        total = load["_total"]
+        results[str(n)] = {
+            "ready_s": round(ready_s, 3),
+            "drain_s": round(drain_s, 3),
+            "throughput_rps": total.get("throughput_rps", 0.0),
+            "p50_ms": total["p50_ms"],
+            "p99_ms": total["p99_ms"],
+            "errors": total["errors"],
+            "routes": {route: summary for route, summary in load.items() if route != "_total"},
+        }
+        print(f"workers={n} rps={results[str(n)]['throughput_rps']} p99={total['p99_ms']}ms", file=sys.stderr)
+
+    base = results.get("1", {}).get("throughput_rps")
+    if base:
+        for n, result in results.items():
+            result["scaling_efficiency"] = round(result["throughput_rps"] / (int(n) * base), 3)
+
+    params = {k: v for k, v in vars(args).items() if k != "output"}
+    params["mix"] = mix
+    params["cpu_count"] = os.cpu_count()
+    write_report("worker_scaling", params, results, args.output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-name", default=BENCH_DB_NAME)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--workers", type=int, nargs="*", help="Explicit worker counts, e.g. 1 2 4 8")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load per worker count")
+    parser.add_argument("--ready-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--with-reports", action="store_true", help="Include the PDF endpoints (and warm the renderer)")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,151 @@
+# core/cache.py
+"""
+Response cache setup for fastapi-cache.
+
+CACHE_BACKEND selects the store:
+    memory - per-process LRU bounded by CACHE_MAX_BYTES (default); invalidations
+             reach the other workers through a shared version counter per
+             namespace, which they follow through `collection_versions.tracker`
+    redis  - shared by every worker/replica; needs the `redis` package and CACHE_REDIS_URL
+             (any Redis-protocol server works, e.g. a local redis or KeyDB)
+
+Write routes call `invalidate()` for the namespaces their data feeds, so cached
+responses are dropped as soon as the underlying data changes. Routes that also
+bump collection versions call `drop()` and pass its keys to the same
+`collection_versions.changed()` call instead, saving a round trip.
+"""
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends import Backend
+
+from core.config import settings
+from services import collection_versions
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "inventory-cache"
+
+# Namespaces used by @cache(namespace=...)
+DASHBOARD_NAMESPACE = "dashboard"
+
+
+def version_key(namespace: str) -> str:
+    """collection_versions id for a full cache namespace ("<prefix>:<namespace>")."""
+    return f"cache:{namespace}"
+
+
+class BoundedInMemoryBackend(Backend):
+    """LRU cache with per-entry TTL and a cap on the total size of stored values."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._store: "OrderedDict[str, Tuple[Optional[float], bytes]]" = OrderedDict()
+        self._size = 0
+        self._versions: Dict[str, int] = {}  # namespace -> version its entries were stored under
+
+    async def _ensure_fresh(self, key: str) -> None:
+        """Drop the key's namespace if the tracker has seen an invalidation since the last lookup."""
+        namespace = key.rsplit(":", 1)[0]  # "<prefix>:<namespace>:<hash>"
+        current = collection_versions.tracker.version(version_key(namespace))
+        if current is None:
+            return
+        known = self._versions.get(namespace)
+        if known is None or current > known:
+            # Entries stored before the first known version may predate an invalidation
+            await self.clear(namespace=namespace)
+            self._versions[namespace] = current
+
+    def _get_entry(self, key: str) -> Optional[Tuple[Optional[float], bytes]]:
+        entry = self._store.get(key)
+        if entry is None:
+            return None
+        expires_at, _ = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._delete(key)
+            return None
+        self._store.move_to_end(key)
+        return entry
+
+    def _delete(self, key: str) -> None:
+        entry = self._store.pop(key, None)
+        if entry is not None:
+            self._size -= sys.getsizeof(entry[1])
+
+    async def get_with_ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        await self._ensure_fresh(key)
+        entry = self._get_entry(key)
+        if entry is None:
+            return 0, None
+        expires_at, value = entry
+        ttl = int(expires_at - time.monotonic()) if expires_at is not None else -1
+        return ttl, value
+
+    async def get(self, key: str) -> Optional[bytes]:
+        await self._ensure_fresh(key)
+        entry = self._get_entry(key)
+        return entry[1] if entry else None
+
+    async def set(self, key: str, value: bytes, expire: Optional[int] = None) -> None:
+        size = sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+        self._delete(key)
+        self._store[key] = (time.monotonic() + expire if expire else None, value)
+        self._size += size
+        while self._size > self.max_bytes:
+            oldest = next(iter(self._store))
+            self._delete(oldest)
+
+    async def clear(self, namespace: Optional[str] = None, key: Optional[str] = None) -> int:
+        if namespace:
+            keys = [k for k in self._store if k.startswith(namespace)]
+        elif key:
+            keys = [key] if key in self._store else []
+        else:
+            keys = list(self._store)
+        for k in keys:
+            self._delete(k)
+        return len(keys)
+
+
+def build_backend() -> Backend:
+    if settings.CACHE_BACKEND == "redis":
+        from redis import asyncio as aioredis
+        from fastapi_cache.backends.redis import RedisBackend
+
+        return RedisBackend(aioredis.from_url(settings.CACHE_REDIS_URL))
+    if settings.CACHE_BACKEND != "memory":
+        logger.warning(f"Unknown CACHE_BACKEND {settings.CACHE_BACKEND!r}, using memory")
+    return BoundedInMemoryBackend(max_bytes=settings.CACHE_MAX_BYTES)
+
+
+def init_cache() -> None:
+    FastAPICache.init(build_backend(), prefix=CACHE_PREFIX)
+
+
+async def drop(*namespaces: str) -> List[str]:
+    """
+    Drop every cached response in the given namespaces from this worker's backend
+    (or the shared Redis) and return the collection_versions keys the caller must
+    bump so the other workers' memory caches drop theirs too. Never fails the
+    calling request.
+    """
+    version_keys = []
+    for namespace in namespaces:
+        try:
+            await FastAPICache.clear(namespace=namespace)
+            if isinstance(FastAPICache.get_backend(), BoundedInMemoryBackend):
+                version_keys.append(version_key(f"{CACHE_PREFIX}:{namespace}"))
+        except Exception as e:
+            logger.error(f"Cache invalidation failed for {namespace}: {str(e)}")
+    return version_keys
+
+
+async def invalidate(*namespaces: str) -> None:
+    """Drop every cached response in the given namespaces on every worker. Never fails the calling request."""
+    await collection_versions.changed(*await drop(*namespaces))
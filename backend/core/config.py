@@ -4,15 +4,111 @@ import os
 # Load .env file from project root
 load_dotenv()
 
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def default_worker_count() -> int:
+    """One worker per core available to this process."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS / Windows
+        return os.cpu_count() or 1
+
+
 class Settings:
-    # Database
-    MONGO_URI: str = os.getenv("MONGO_URI", "mongodb://localhost:27017/product_inventory")
+    # Database (the client is created in db.py). Must be a replica set or sharded
+    # cluster: orders use multi-document transactions
+    MONGO_URI: str = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
     MONGO_DB_NAME: str = os.getenv("MONGO_DB_NAME", "product_inventory")
 
+    # Connection pool, timeouts (ms) and wire compression ("zstd,snappy,zlib"; empty disables)
+    MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", 10))
+    MONGO_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000))
+    MONGO_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+    MONGO_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 0))  # 0 = no timeout
+    MONGO_COMPRESSORS: str = os.getenv("MONGO_COMPRESSORS", "")
+    # Attempts for transactions aborted by write conflicts before answering 409
+    MONGO_TRANSACTION_ATTEMPTS: int = int(os.getenv("MONGO_TRANSACTION_ATTEMPTS", 5))
+
+    # Reads for reports and the dashboard (primary, primaryPreferred, secondary,
+    # secondaryPreferred, nearest); max staleness -1 = no limit, otherwise >= 90
+    MONGO_REPORTING_READ_PREFERENCE: str = os.getenv("MONGO_REPORTING_READ_PREFERENCE", "secondaryPreferred")
+    MONGO_REPORTING_MAX_STALENESS_SECONDS: int = int(os.getenv("MONGO_REPORTING_MAX_STALENESS_SECONDS", -1))
+
     # Security
     JWT_SECRET: str = os.getenv("JWT_SECRET", "supersecret")
     JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
     JWT_EXPIRATION_MINUTES: int = int(os.getenv("JWT_EXPIRATION_MINUTES", 60))
+    # Lifetime of the stream-only tokens that EventSource clients put in the URL
+    STREAM_TOKEN_SECONDS: int = int(os.getenv("STREAM_TOKEN_SECONDS", 60))
+
+    # Password hashing
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+
+    # Authenticated-user cache
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+    USER_CACHE_MAX_SIZE: int = int(os.getenv("USER_CACHE_MAX_SIZE", 1024))
+
+    # Response cache ("memory" or "redis")
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_MAX_BYTES: int = int(os.getenv("CACHE_MAX_BYTES", 32 * 1024 * 1024))
+    CACHE_REDIS_URL: str = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+    # Full re-read of the collection version counters (bumps normally arrive as events).
+    # The user cache, category index and in-memory response cache all follow these counters
+    VERSION_RESYNC_SECONDS: float = float(os.getenv("VERSION_RESYNC_SECONDS", 30))
+    # Cache-Control sent with the ETag / Last-Modified validators of catalog endpoints
+    PRODUCTS_CACHE_CONTROL: str = os.getenv("PRODUCTS_CACHE_CONTROL", "no-cache")
+    CATEGORIES_CACHE_CONTROL: str = os.getenv("CATEGORIES_CACHE_CONTROL", "no-cache")
+
+    # Stock ledger checkpoints (0 disables the background loop)
+    STOCK_CHECKPOINT_INTERVAL_SECONDS: int = int(os.getenv("STOCK_CHECKPOINT_INTERVAL_SECONDS", 3600))
+
+    # Live dashboard: full rebuild interval for streamed summaries
+    DASHBOARD_FEED_REFRESH_SECONDS: int = int(os.getenv("DASHBOARD_FEED_REFRESH_SECONDS", 300))
+
+    # Idempotency-Key records (POST /orders/)
+    IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+    IDEMPOTENCY_CACHE_SIZE: int = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", 10000))
+    IDEMPOTENCY_WAIT_SECONDS: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 30))
+
+    # Reorder level for products that do not set their own (changing it recomputes
+    # their stored low-stock flags at the next startup)
+    DEFAULT_REORDER_LEVEL: int = int(os.getenv("DEFAULT_REORDER_LEVEL", 5))
+
+    # PDF rendering pool
+    PDF_RENDER_WORKERS: int = int(os.getenv("PDF_RENDER_WORKERS", 2))
+    PDF_RENDER_MAX_PENDING: int = int(os.getenv("PDF_RENDER_MAX_PENDING", 8))
+    PDF_JOB_TTL_SECONDS: int = int(os.getenv("PDF_JOB_TTL_SECONDS", 600))
+    # Finished report jobs are kept here so any worker can serve them
+    PDF_JOB_DIR: str = os.getenv("PDF_JOB_DIR", os.path.join(BACKEND_DIR, "var", "report_jobs"))
+    # Compiled Jinja bytecode shared by all render processes (empty disables it)
+    PDF_TEMPLATE_CACHE_DIR: str = os.getenv("PDF_TEMPLATE_CACHE_DIR", os.path.join(BACKEND_DIR, "var", "template_cache"))
+    # Rendered report PDFs, keyed by parameters and data versions; LRU-evicted past the size cap (0 disables)
+    REPORT_CACHE_DIR: str = os.getenv("REPORT_CACHE_DIR", os.path.join(BACKEND_DIR, "var", "report_cache"))
+    REPORT_CACHE_MAX_BYTES: int = int(os.getenv("REPORT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+    # Start the render processes and load templates in the background at startup.
+    # Off by default: otherwise every worker and replica pays for WeasyPrint and
+    # PDF_RENDER_WORKERS processes at boot, whether or not it ever serves a report
+    PDF_WARMUP: bool = os.getenv("PDF_WARMUP", "false").lower() in ("1", "true", "yes")
+
+    # Uploaded files (served under /static/uploads)
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", os.path.join(BACKEND_DIR, "static", "uploads"))
+
+    # Server (serve.py)
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", 0) or default_worker_count())
+    GRACEFUL_SHUTDOWN_SECONDS: int = int(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", 30))
+
+    # Metrics: log requests slower than this (0 disables the slow-request log)
+    SLOW_REQUEST_MS: int = int(os.getenv("SLOW_REQUEST_MS", 0))
+
+    # Root log level for the API process
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
 
     # App Config
     APP_NAME: str = os.getenv("APP_NAME", "Product Inventory Management System")
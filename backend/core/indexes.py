@@ -0,0 +1,160 @@
+# core/indexes.py
+"""
+Index declarations for every collection the routes query.
+
+`ensure_indexes()` runs at app startup: it creates any missing index and
+then verifies that each declared index exists with the expected options.
+Run `python -m core.indexes` to do the same from the command line.
+"""
+import asyncio
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.collation import Collation, CollationStrength
+from pymongo.errors import OperationFailure
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Case-insensitive comparison ("Coke" == "coke"). Queries must pass the same
+# collation to be answered by the indexes declared with it.
+CASE_INSENSITIVE = Collation(locale="en", strength=CollationStrength.SECONDARY)
+
+
+# -------------------
+# Declared indexes
+# -------------------
+INDEXES: Dict[str, List[IndexModel]] = {
+    "products": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("category_id", ASCENDING), ("name", ASCENDING)],
+            name="category_name_ci_unique",
+            unique=True,
+            collation=CASE_INSENSITIVE,
+        ),
+        # Prefix search (multikey over maintained tokens, see services/product_search.py)
+        IndexModel([("search_terms", ASCENDING)], name="search_terms"),
+        # Keyset pagination orders
+        IndexModel([("name", ASCENDING), ("id", ASCENDING)], name="name_id"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id_desc"),
+        # Only products at or below their reorder level (see services/stock_alerts.py)
+        IndexModel(
+            [("stock", ASCENDING)],
+            name="below_reorder_stock",
+            partialFilterExpression={"below_reorder": True},
+        ),
+    ],
+    "categories": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("name", ASCENDING)],
+            name="name_ci_unique",
+            unique=True,
+            collation=CASE_INSENSITIVE,
+        ),
+    ],
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("username", ASCENDING)],
+            name="username_ci_unique",
+            unique=True,
+            collation=CASE_INSENSITIVE,
+        ),
+        # Login matches the username exactly (simple binary collation)
+        IndexModel([("username", ASCENDING)], name="username_exact"),
+        IndexModel([("email", ASCENDING)], name="email", sparse=True),
+    ],
+    "orders": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Date-range reports and keyset pagination (newest first)
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id_desc"),
+    ],
+    # Idempotency-Key records expire after IDEMPOTENCY_TTL_SECONDS (services/idempotency.py)
+    "idempotency_keys": [
+        IndexModel(
+            [("created_at", ASCENDING)],
+            name="created_at_ttl",
+            expireAfterSeconds=settings.IDEMPOTENCY_TTL_SECONDS,
+        ),
+    ],
+    # Stock ledger (services/stock_ledger.py)
+    "stock_movements": [
+        IndexModel([("product_id", ASCENDING), ("timestamp", DESCENDING)], name="product_timestamp"),
+        IndexModel([("timestamp", DESCENDING)], name="timestamp_desc"),
+    ],
+    "stock_snapshots": [
+        IndexModel([("product_id", ASCENDING), ("timestamp", DESCENDING)], name="product_timestamp"),
+        IndexModel([("timestamp", DESCENDING)], name="timestamp_desc"),
+    ],
+    "stock_checkpoints": [
+        IndexModel([("timestamp", DESCENDING)], name="timestamp_desc"),
+    ],
+}
+
+
+# -------------------
+# Create
+# -------------------
+async def create_indexes(db) -> None:
+    """Create every declared index. Existing indexes are left untouched."""
+    for collection, models in INDEXES.items():
+        for model in models:
+            try:
+                await db[collection].create_indexes([model])
+            except OperationFailure as e:
+                # e.g. duplicate names already stored before the unique index existed
+                logger.error(
+                    "Could not create index %s on %s: %s",
+                    model.document["name"], collection, e,
+                )
+
+
+# -------------------
+# Verify
+# -------------------
+async def verify_indexes(db) -> List[str]:
+    """Return a list of problems (missing or mismatched indexes)."""
+    problems = []
+    for collection, models in INDEXES.items():
+        existing = await db[collection].index_information()
+        for model in models:
+            spec = model.document
+            name = spec["name"]
+            info = existing.get(name)
+            if info is None:
+                problems.append(f"{collection}.{name}: missing")
+                continue
+            if list(info["key"]) != list(spec["key"].items()):
+                problems.append(f"{collection}.{name}: key mismatch {info['key']}")
+            if bool(info.get("unique")) != bool(spec.get("unique")):
+                problems.append(f"{collection}.{name}: unique mismatch")
+            expected_strength = spec.get("collation", {}).get("strength")
+            actual_strength = info.get("collation", {}).get("strength")
+            if expected_strength and expected_strength != actual_strength:
+                problems.append(f"{collection}.{name}: collation mismatch")
+            if spec.get("expireAfterSeconds") != info.get("expireAfterSeconds"):
+                problems.append(f"{collection}.{name}: TTL mismatch")
+            if spec.get("partialFilterExpression") != info.get("partialFilterExpression"):
+                problems.append(f"{collection}.{name}: partial filter mismatch")
+    return problems
+
+
+async def ensure_indexes(db) -> None:
+    """Create missing indexes and log anything that still does not match."""
+    await create_indexes(db)
+    problems = await verify_indexes(db)
+    for problem in problems:
+        logger.warning("Index check failed: %s", problem)
+    if not problems:
+        logger.info("All declared indexes are in place")
+
+
+if __name__ == "__main__":
+    from db import db
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(ensure_indexes(db))
@@ -0,0 +1,191 @@
+# core/metrics.py
+"""
+Per-route request metrics and Mongo command attribution.
+
+`MetricsMiddleware` times every HTTP request and keeps per-route latency
+histograms. `MongoCommandListener` (registered on the Motor client in db.py)
+adds each command's count and duration to the request that issued it; the
+current request is found through a contextvar, which Motor copies into its
+executor threads. `render_prometheus()` produces the text exposition served
+at /metrics. Requests slower than SLOW_REQUEST_MS are logged with their
+command breakdown.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Label for requests that did not match a route (404s, CORS preflights, ...)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestStats:
+    """Mongo commands issued while serving one request."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commands: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])  # name -> [count, seconds]
+
+    def add(self, command: str, seconds: float) -> None:
+        with self.lock:
+            entry = self.commands[command]
+            entry[0] += 1
+            entry[1] += seconds
+
+    @property
+    def total_commands(self) -> int:
+        return sum(int(c[0]) for c in self.commands.values())
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class Registry:
+    """Process-wide aggregates, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self.latency_buckets: Dict[str, List[int]] = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+        self.latency_sum: Dict[str, float] = defaultdict(float)
+        self.latency_count: Dict[str, int] = defaultdict(int)
+        self.mongo_commands: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.mongo_seconds: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.unattributed_commands: Dict[str, int] = defaultdict(int)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        with self.lock:
+            self.requests[(method, route, status)] += 1
+            self.latency_buckets[route][bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.latency_sum[route] += seconds
+            self.latency_count[route] += 1
+            for command, (count, command_seconds) in stats.commands.items():
+                self.mongo_commands[(route, command)] += int(count)
+                self.mongo_seconds[(route, command)] += command_seconds
+
+    def observe_unattributed(self, command: str) -> None:
+        with self.lock:
+            self.unattributed_commands[command] += 1
+
+
+registry = Registry()
+
+
+# -------------------
+# Mongo command listener
+# -------------------
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def _record(self, event):
+        stats = current_request.get()
+        if stats is None:
+            registry.observe_unattributed(event.command_name)
+            return
+        stats.add(event.command_name, event.duration_micros / 1_000_000)
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+
+# -------------------
+# ASGI middleware
+# -------------------
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", UNMATCHED_ROUTE)
+            registry.observe_request(scope["method"], route_path, status_code, elapsed, stats)
+            if settings.SLOW_REQUEST_MS and elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+                breakdown = ", ".join(
+                    f"{name}={int(count)} ({seconds * 1000:.1f} ms)"
+                    for name, (count, seconds) in sorted(stats.commands.items())
+                )
+                logger.warning(
+                    "Slow request %s %s -> %s in %.1f ms, %d mongo commands: %s",
+                    scope["method"], route_path, status_code, elapsed * 1000,
+                    stats.total_commands, breakdown or "none",
+                )
+
+
+# -------------------
+# Prometheus text format
+# -------------------
+def _labels(**labels) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def render_prometheus(extra_gauges: Optional[Dict[str, float]] = None) -> str:
+    lines = []
+    with registry.lock:
+        lines.append("# HELP http_requests_total HTTP requests by method, route and status.")
+        lines.append("# TYPE http_requests_total counter")
+        for (method, route, status), count in sorted(registry.requests.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+        lines.append("# HELP http_request_duration_seconds Request latency by route.")
+        lines.append("# TYPE http_request_duration_seconds histogram")
+        for route in sorted(registry.latency_buckets):
+            cumulative = 0
+            for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), registry.latency_buckets[route]):
+                cumulative += count
+                lines.append(f"http_request_duration_seconds_bucket{_labels(route=route, le=bound)} {cumulative}")
+            lines.append(f"http_request_duration_seconds_sum{_labels(route=route)} {registry.latency_sum[route]:.6f}")
+            lines.append(f"http_request_duration_seconds_count{_labels(route=route)} {registry.latency_count[route]}")
+
+        lines.append("# HELP mongo_commands_total Mongo commands issued, by route and command.")
+        lines.append("# TYPE mongo_commands_total counter")
+        for (route, command), count in sorted(registry.mongo_commands.items()):
+            lines.append(f"mongo_commands_total{_labels(route=route, command=command)} {count}")
+        for command, count in sorted(registry.unattributed_commands.items()):
+            lines.append(f"mongo_commands_total{_labels(route='<background>', command=command)} {count}")
+
+        lines.append("# HELP mongo_command_seconds_total Time spent in Mongo commands, by route and command.")
+        lines.append("# TYPE mongo_command_seconds_total counter")
+        for (route, command), seconds in sorted(registry.mongo_seconds.items()):
+            lines.append(f"mongo_command_seconds_total{_labels(route=route, command=command)} {seconds:.6f}")
+
+    for name, value in sorted((extra_gauges or {}).items()):
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
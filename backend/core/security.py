@@ -1,15 +1,23 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
 from passlib.context import CryptContext
 import jwt
 from core.config import settings
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from db import db  # Import your MongoDB instance
+from core.user_cache import user_cache
 
 # -------------------
 # Password Hashing
 # -------------------
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
 
 def hash_password(password: str) -> str:
     """Hash a plain text password."""
@@ -19,6 +27,40 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
     return pwd_context.verify(plain_password, hashed_password)
 
+def _bcrypt_rounds(hashed_password: str) -> Optional[int]:
+    """Cost factor of a "$2b$12$..." hash."""
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True when the hash uses a deprecated scheme or a different bcrypt cost."""
+    return (
+        pwd_context.needs_update(hashed_password)
+        or _bcrypt_rounds(hashed_password) != settings.BCRYPT_ROUNDS
+    )
+
+def _verify_and_rehash(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    if needs_rehash(hashed_password):
+        return True, pwd_context.hash(plain_password)
+    return True, None
+
+async def hash_password_async(password: str) -> str:
+    """Hash a plain text password without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, hash_password, password)
+
+async def verify_and_rehash_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password without blocking the event loop.
+    Returns (valid, new_hash); new_hash is set when the stored hash should be replaced.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, _verify_and_rehash, plain_password, hashed_password)
+
 # -------------------
 # JWT Token Handling
 # -------------------
@@ -31,6 +73,14 @@ def create_access_token(data: dict, expires_delta: int = None) -> str:
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
+# Tokens with this scope only open event streams; they travel in URLs (EventSource
+# cannot send headers), so they are short-lived and refused everywhere else
+STREAM_SCOPE = "stream"
+
+def create_stream_token(user_id: str) -> str:
+    expire = datetime.utcnow() + timedelta(seconds=settings.STREAM_TOKEN_SECONDS)
+    return jwt.encode({"sub": user_id, "scope": STREAM_SCOPE, "exp": expire}, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+
 def decode_access_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
@@ -57,10 +107,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
     """Get current user from JWT token and fetch full data from DB."""
     payload = decode_access_token(token)
     user_id = payload.get("sub")
-    if not user_id:
+    if not user_id or payload.get("scope") == STREAM_SCOPE:
         raise HTTPException(status_code=401, detail="Invalid token: no subject")
 
-    user = await db["users"].find_one({"id": user_id})
+    user = await user_cache.get(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
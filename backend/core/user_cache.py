@@ -0,0 +1,92 @@
+# core/user_cache.py
+"""
+In-process TTL + LRU cache of resolved users, keyed by the JWT `sub` (user id).
+
+Every authenticated request resolves its user; the users collection is tiny
+and rarely changes, so lookups are served from here and only fall through to
+Mongo on a miss. Routes that modify a user must call `user_cache.invalidate()`,
+which also bumps the shared "users" version so other workers drop their copies
+(each compares it with its `collection_versions.tracker` on every lookup).
+"""
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from core.config import settings
+from db import db
+from services import collection_versions
+
+VERSION_KEY = "users"
+
+
+class UserCache:
+    def __init__(self, ttl_seconds: int, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.version: Optional[int] = None
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        """Return the user document for `user_id`, loading it on a miss."""
+        self._ensure_fresh()
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return dict(user)
+            del self._entries[user_id]
+
+        self.misses += 1
+        user = await db["users"].find_one({"id": user_id})
+        if user is not None:
+            self._store(user_id, user)
+            return dict(user)
+        return None
+
+    def _store(self, user_id: str, user: dict) -> None:
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, user)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _ensure_fresh(self) -> None:
+        """Clear everything if another worker changed a user since the last lookup."""
+        version = collection_versions.tracker.version(VERSION_KEY)
+        if version is None:
+            return
+        if self.version is None or version > self.version:
+            self._entries.clear()
+            self.version = version
+
+    async def invalidate(self, user_id: str) -> None:
+        self._entries.pop(user_id, None)
+        self._ensure_fresh()
+        previous = self.version
+        version = await collection_versions.bump(VERSION_KEY)
+        if previous is None or version != previous + 1:
+            # Other workers changed users and their events have not arrived yet:
+            # their bumps are folded into this one, so drop what they may have changed
+            self._entries.clear()
+        self.version = version
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+user_cache = UserCache(
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+    max_size=settings.USER_CACHE_MAX_SIZE,
+)
@@ -1,11 +1,170 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from dotenv import load_dotenv
-import os
+# db.py
+"""
+MongoDB client and database handles.
 
-load_dotenv()
+The Motor client is created by `connect_client()` (from the app lifespan, or
+lazily on first use by scripts) with the pool, timeout and compression
+settings in core.config, and closed by `close_client()`.
 
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-DB_NAME = os.getenv("MONGO_DB_NAME", "product_inventory")
+`db` and `reporting_db` are proxies that resolve to the current client's
+database on each access, so modules can keep doing `from db import db` at
+import time, before any client exists. `reporting_db` reads with
+MONGO_REPORTING_READ_PREFERENCE (secondaryPreferred by default) so report and
+dashboard aggregations stay off the primary that takes order writes.
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
+`run_transaction()` runs multi-document writes with bounded retries on
+transient transaction errors (write conflicts on hot documents). Transactions
+need a replica set (a single-member one is enough) or a sharded cluster;
+`require_transactions()` refuses to start the app against a standalone mongod.
+"""
+import asyncio
+import random
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.errors import PyMongoError
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+from core.config import settings
+from core.metrics import MongoCommandListener
+
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def client_options() -> Dict[str, Any]:
+    """Keyword arguments for the Motor client, from settings."""
+    options: Dict[str, Any] = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGO_SOCKET_TIMEOUT_MS or None,
+        "event_listeners": [MongoCommandListener()],
+    }
+    if settings.MONGO_COMPRESSORS:
+        options["compressors"] = settings.MONGO_COMPRESSORS
+    return options
+
+
+def read_preference(name: str, max_staleness: int = -1):
+    """Read preference from its connection-string name, e.g. "secondaryPreferred"."""
+    modes = {
+        "primary": lambda: Primary(),
+        "primaryPreferred": lambda: PrimaryPreferred(max_staleness=max_staleness),
+        "secondary": lambda: Secondary(max_staleness=max_staleness),
+        "secondaryPreferred": lambda: SecondaryPreferred(max_staleness=max_staleness),
+        "nearest": lambda: Nearest(max_staleness=max_staleness),
+    }
+    if name not in modes:
+        raise ValueError(f"Unknown read preference {name!r}, expected one of {', '.join(modes)}")
+    return modes[name]()
+
+
+def connect_client() -> AsyncIOMotorClient:
+    """Return the client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(settings.MONGO_URI, **client_options())
+    return _client
+
+
+def close_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+class _DatabaseProxy:
+    """Stands in for the AsyncIOMotorDatabase of whichever client is current."""
+
+    def __init__(self, read_preference=None):
+        self._read_preference = read_preference
+        self._resolved: Optional[tuple] = None  # (client, database)
+
+    def _database(self) -> AsyncIOMotorDatabase:
+        client = connect_client()
+        if self._resolved is None or self._resolved[0] is not client:
+            database = client.get_database(settings.MONGO_DB_NAME, read_preference=self._read_preference)
+            self._resolved = (client, database)
+        return self._resolved[1]
+
+    def __getitem__(self, name: str):
+        return self._database()[name]
+
+    def __getattr__(self, name: str):
+        return getattr(self._database(), name)
+
+
+db = _DatabaseProxy()
+reporting_db = _DatabaseProxy(read_preference(
+    settings.MONGO_REPORTING_READ_PREFERENCE,
+    settings.MONGO_REPORTING_MAX_STALENESS_SECONDS,
+))
+
+
+async def require_transactions() -> None:
+    """Raise RuntimeError unless the deployment supports multi-document transactions."""
+    hello = await db.command("hello")
+    if hello.get("setName") or hello.get("msg") == "isdbgrid":  # replica set member or mongos
+        return
+    raise RuntimeError(
+        f"MongoDB at {settings.MONGO_URI} is a standalone server, but orders need "
+        "multi-document transactions, which only run on a replica set. Start mongod "
+        "with --replSet rs0, run rs.initiate() once and add ?replicaSet=rs0 to MONGO_URI."
+    )
+
+
+class TransactionConflict(Exception):
+    """A transaction still hit transient errors (e.g. WriteConflict) after every retry."""
+
+
+def _has_label(error: BaseException, label: str) -> bool:
+    return isinstance(error, PyMongoError) and error.has_error_label(label)
+
+
+async def run_transaction(callback: Callable[[Any], Awaitable[Any]], attempts: Optional[int] = None) -> Any:
+    """
+    Run `await callback(session)` in a transaction and commit it, returning the
+    callback's result.
+
+    The whole transaction is retried on TransientTransactionError and the commit
+    on UnknownTransactionCommitResult, up to `attempts` times
+    (MONGO_TRANSACTION_ATTEMPTS) with a short jittered backoff; after that
+    TransactionConflict is raised. The callback may run more than once, so it
+    must only write through the session. Any other exception aborts and propagates.
+    """
+    attempts = attempts or settings.MONGO_TRANSACTION_ATTEMPTS
+    async with await connect_client().start_session() as session:
+        for attempt in range(1, attempts + 1):
+            session.start_transaction()
+            try:
+                result = await callback(session)
+            except BaseException as e:
+                if session.in_transaction:
+                    await session.abort_transaction()
+                if _has_label(e, "TransientTransactionError"):
+                    if attempt < attempts:
+                        await asyncio.sleep(random.uniform(0, 0.02 * attempt))
+                        continue
+                    raise TransactionConflict(str(e)) from e
+                raise
+
+            commit_attempts = 0
+            while True:
+                try:
+                    await session.commit_transaction()
+                    return result
+                except PyMongoError as e:
+                    commit_attempts += 1
+                    if _has_label(e, "UnknownTransactionCommitResult") and commit_attempts < attempts:
+                        continue
+                    if not _has_label(e, "TransientTransactionError"):
+                        raise
+                    if attempt == attempts:
+                        raise TransactionConflict(str(e)) from e
+                    break
+            await asyncio.sleep(random.uniform(0, 0.02 * attempt))
+        raise TransactionConflict("Transaction retries exhausted")
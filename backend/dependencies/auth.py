@@ -1,24 +1,31 @@
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from core.security import decode_access_token
-from db import db
+from core.security import decode_access_token, STREAM_SCOPE
+from core.user_cache import user_cache
 from bson import ObjectId
 
 # OAuth2 scheme: looks for "Authorization: Bearer <token>"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    return await _user_for_token(token, scope=None)
+
+
+async def _user_for_token(token: str, scope: Optional[str]):
+    """Resolve the user of a token whose "scope" claim must equal `scope` (None: a regular access token)."""
     try:
         payload = decode_access_token(token)
         user_id: str = payload.get("sub")
-        if user_id is None:
+        if user_id is None or payload.get("scope") != scope:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid authentication token",
             )
 
-        # Look up user in DB
-        user = await db["users"].find_one({"id": user_id})
+        # Look up user (cached, falls back to DB)
+        user = await user_cache.get(user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -37,3 +44,25 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=str(e)
         )
+
+
+async def get_current_user_for_stream(
+    header_token: Optional[str] = Depends(oauth2_scheme_optional),
+    stream_token: Optional[str] = Query(
+        None, description="Short-lived token from POST /auth/stream-token, for EventSource clients that cannot set headers"
+    ),
+):
+    """
+    Like get_current_user, but also accepts a stream token as a query parameter.
+    The regular bearer token is only accepted in the Authorization header, so it
+    never lands in access logs or browser history.
+    """
+    if header_token:
+        return await _user_for_token(header_token, scope=None)
+    if stream_token:
+        return await _user_for_token(stream_token, scope=STREAM_SCOPE)
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authenticated",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
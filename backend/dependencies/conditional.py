@@ -0,0 +1,37 @@
+from typing import Optional
+from fastapi import HTTPException, Request, status
+from services import collection_versions
+from utils.http_cache import Validators, is_not_modified, weak_etag
+
+
+def conditional_get(*collections: str, cache_control: str):
+    """
+    Dependency for read endpoints whose response depends only on `collections`
+    and the query string.
+
+    The validators come from this worker's in-memory version counters, so a
+    matching If-None-Match / If-Modified-Since is answered with 304 before the
+    endpoint runs, without touching Mongo. Otherwise the endpoint gets the
+    validators to send with its response (None until the counters are loaded).
+    An endpoint answering from an in-process copy (like the category index) must
+    refresh that copy from the same tracker, or it could send an old body under
+    a new ETag.
+    """
+    async def dependency(request: Request) -> Optional[Validators]:
+        versions = [collection_versions.tracker.get(name) for name in collections]
+        if any(v is None for v in versions):
+            return None
+
+        # A collection never bumped has no known modification time, so no Last-Modified at all
+        modified = [updated_at for _, updated_at in versions]
+        tags = [f"{name}:{version}" for name, (version, _) in zip(collections, versions)]
+        validators = Validators(
+            etag=weak_etag(request.url.path, request.url.query, *tags),
+            last_modified=max(modified) if all(modified) else None,
+            cache_control=cache_control,
+        )
+        if is_not_modified(request, validators):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators.headers)
+        return validators
+
+    return dependency
@@ -1,14 +1,75 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from routes import auth, products, users, orders, reports, dashboard, categories  # <-- added categories
+from db import db, connect_client, close_client, require_transactions
+from core.cache import init_cache, drop, DASHBOARD_NAMESPACE
+from core.config import settings
+from core.indexes import ensure_indexes
+from core.metrics import MetricsMiddleware, render_prometheus
+from core.user_cache import user_cache
+from services import collection_versions, events, product_search, stock_alerts, stock_ledger
+from services.category_index import category_index
+from utils.pdf_utils import render_pool
+from routes import auth, products, users, orders, reports, dashboard, categories, stock  # <-- added categories
 
-app = FastAPI()
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
 
-# Initialize FastAPI-Cache
-FastAPICache.init(InMemoryBackend(), prefix="inventory-cache")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the Mongo pool (minPoolSize connections are filled in the background)
+    connect_client()
+    await db.command("ping")
+    # Orders are written in transactions: fail here rather than on the first order
+    await require_transactions()
+
+    # Create / verify indexes before serving traffic
+    await ensure_indexes(db)
+    await category_index.load()
+    warmup_task = None
+    if settings.PDF_WARMUP:
+        # Render processes load WeasyPrint, templates and fonts in the background,
+        # so they never delay the first API request
+        warmup_task = asyncio.create_task(render_pool.warm())
+    await events.ensure_collection()
+    # Stored low-stock flags follow DEFAULT_REORDER_LEVEL; recompute them if it changed
+    if await stock_alerts.sync_default_level():
+        await collection_versions.changed("products", *await drop(DASHBOARD_NAMESPACE))
+    # Products stored before search terms existed would never match ?search=
+    backfill_task = asyncio.create_task(product_search.backfill())
+    events_task = asyncio.create_task(events.run_tail())
+    # In-memory version counters for conditional GETs (first resync happens right away)
+    versions_task = asyncio.create_task(collection_versions.tracker.run())
+
+    checkpoint_task = None
+    if settings.STOCK_CHECKPOINT_INTERVAL_SECONDS > 0:
+        checkpoint_task = asyncio.create_task(
+            stock_ledger.run_checkpoints(settings.STOCK_CHECKPOINT_INTERVAL_SECONDS)
+        )
+
+    yield
+
+    events_task.cancel()
+    if not backfill_task.done():
+        backfill_task.cancel()
+    versions_task.cancel()
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    if checkpoint_task:
+        checkpoint_task.cancel()
+    render_pool.shutdown()
+    close_client()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Initialize FastAPI-Cache (backend chosen by CACHE_BACKEND)
+init_cache()
 
 # CORS Middleware
 origins = [
@@ -22,8 +83,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "Idempotent-Replayed", "ETag", "Last-Modified"],
 )
 
+# Per-route latency and Mongo command metrics (outermost, so it times everything)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    cache_stats = user_cache.stats()
+    gauges = {f"user_cache_{k}": v for k, v in cache_stats.items() if isinstance(v, (int, float))}
+    return PlainTextResponse(render_prometheus(gauges), media_type="text/plain; version=0.0.4")
+
+
 # Register routes
 app.include_router(auth.router)
 app.include_router(categories.router)  # <-- added here
@@ -32,3 +105,4 @@ app.include_router(users.router)
 app.include_router(orders.router)
 app.include_router(reports.router)
 app.include_router(dashboard.router)
+app.include_router(stock.router)
@@ -9,6 +9,7 @@ class ProductBase(BaseModel):
     description: Optional[str] = Field(None, max_length=1000)
     price: float = Field(..., gt=0, description="Price must be greater than 0")
     stock: int = Field(..., ge=0, description="Stock cannot be negative")
+    reorder_level: Optional[int] = Field(None, ge=0, description="Low-stock threshold (default DEFAULT_REORDER_LEVEL)")
     is_active: bool = Field(default=True)
     category_id: Optional[str] = Field(None, description="UUID string of category")
 
@@ -24,6 +25,7 @@ class ProductUpdate(BaseModel):
     description: Optional[str] = Field(None, max_length=1000)
     price: Optional[float] = Field(None, gt=0)
     stock: Optional[int] = Field(None, ge=0)
+    reorder_level: Optional[int] = Field(None, ge=0)
     is_active: Optional[bool]
     category_id: Optional[str]
 
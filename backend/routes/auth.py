@@ -1,9 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends, status, requests
 from fastapi.security import OAuth2PasswordRequestForm
 from models.user import UserCreate, UserOut
-from core.security import hash_password, verify_password, create_access_token
+from core.security import hash_password_async, verify_and_rehash_password, create_access_token, create_stream_token
+from core.config import settings
 from core.security import get_current_user
+from core.user_cache import user_cache
 from db import db
+from core.indexes import CASE_INSENSITIVE
 import uuid
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -15,7 +18,7 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 @router.post("/signup", response_model=UserOut)
 async def signup(user: UserCreate):
     # Check if user already exists
-    existing = await db["users"].find_one({"username": user.username})
+    existing = await db["users"].find_one({"username": user.username}, collation=CASE_INSENSITIVE)
     if existing:
         raise HTTPException(status_code=400, detail="Username already taken")
 
@@ -26,7 +29,7 @@ async def signup(user: UserCreate):
             raise HTTPException(status_code=400, detail="Email already in use")
 
     # Hash password
-    hashed_pw = hash_password(user.password)
+    hashed_pw = await hash_password_async(user.password)
 
     # Insert user into DB
     new_user = {
@@ -60,10 +63,16 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     if not db_user.get("is_active", True):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User account is deactivated")
 
-    # Verify password
-    if not verify_password(form_data.password, db_user["hashed_password"]):
+    # Verify password (off the event loop)
+    valid, new_hash = await verify_and_rehash_password(form_data.password, db_user["hashed_password"])
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
+    # Bcrypt cost changed since this hash was stored: upgrade it transparently
+    if new_hash:
+        await db["users"].update_one({"id": db_user["id"]}, {"$set": {"hashed_password": new_hash}})
+        await user_cache.invalidate(db_user["id"])
+
     # Create JWT
     token = create_access_token({
         "sub": db_user["id"],  # <-- use id
@@ -74,12 +83,17 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     return {"access_token": token, "token_type": "bearer"}
 
 
+@router.post("/stream-token")
+async def issue_stream_token(current_user=Depends(get_current_user)):
+    """
+    Short-lived token for the event stream endpoints (?stream_token=...), which
+    EventSource clients must pass in the URL. It is refused by every other endpoint.
+    """
+    return {"stream_token": create_stream_token(current_user["id"]), "expires_in": settings.STREAM_TOKEN_SECONDS}
+
+
 @router.get("/me", response_model=UserOut)
 async def get_me(current_user=Depends(get_current_user)):
     """Return user info for the current token."""
-    # Look up full user in DB using ID from token
-    user = await db["users"].find_one({"id": current_user["id"]})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    return UserOut(**user)
\ No newline at end of file
+    # get_current_user already resolved the full user document
+    return UserOut(**current_user)
\ No newline at end of file
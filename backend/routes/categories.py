@@ -1,10 +1,14 @@
 # routes/categories.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from typing import List, Optional
 from datetime import datetime
-import re
+from pymongo.errors import DuplicateKeyError
 from db import db
+from core.config import settings
+from services.category_index import category_index, VERSION_KEY
+from utils.http_cache import Validators
 from dependencies.auth import get_current_user
+from dependencies.conditional import conditional_get
 from models.category import CategoryCreate, CategoryUpdate, CategoryOut
 
 router = APIRouter(prefix="/categories", tags=["categories"])
@@ -14,22 +18,32 @@ async def create_category(category: CategoryCreate, current_user: dict = Depends
     if current_user.get("role") != "owner":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only owners can add categories")
 
-    existing = await db["categories"].find_one({"name": {"$regex": f"^{re.escape(category.name)}$", "$options": "i"}})
-    if existing:
+    if await category_index.id_for_name(category.name):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Category already exists")
 
     new_category = CategoryOut(**category.dict())
-    await db["categories"].insert_one(new_category.dict())
+    try:
+        await db["categories"].insert_one(new_category.dict())
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Category already exists")
+    await category_index.invalidate()
     return new_category
 
 @router.get("/", response_model=List[CategoryOut])
-async def list_categories():
-    categories = await db["categories"].find().to_list(length=None)
+async def list_categories(
+    response: Response,
+    validators: Optional[Validators] = Depends(
+        conditional_get(VERSION_KEY, cache_control=settings.CATEGORIES_CACHE_CONTROL)
+    ),
+):
+    categories = await category_index.all()
+    if validators:
+        response.headers.update(validators.headers)
     return [CategoryOut(**c) for c in categories]
 
 @router.get("/{category_id}", response_model=CategoryOut)
 async def get_category(category_id: str):
-    category = await db["categories"].find_one({"id": category_id})
+    category = await category_index.get(category_id)
     if not category:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
     return CategoryOut(**category)
@@ -44,9 +58,13 @@ async def update_category(category_id: str, category: CategoryUpdate, current_us
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No fields provided for update")
 
     update_data["updated_at"] = datetime.utcnow()
-    result = await db["categories"].update_one({"id": category_id}, {"$set": update_data})
+    try:
+        result = await db["categories"].update_one({"id": category_id}, {"$set": update_data})
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Category already exists")
     if result.matched_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+    await category_index.invalidate()
 
     updated_category = await db["categories"].find_one({"id": category_id})
     return CategoryOut(**updated_category)
@@ -59,6 +77,7 @@ async def delete_category(category_id: str, current_user: dict = Depends(get_cur
     result = await db["categories"].delete_one({"id": category_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+    await category_index.invalidate()
 
     return {"message": "Category deleted successfully"}
 
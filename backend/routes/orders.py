@@ -1,44 +1,89 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from db import db
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Response
+from fastapi.responses import ORJSONResponse
+from typing import Optional
+from db import db, run_transaction, TransactionConflict
 from models.order import OrderCreate, OrderOut, OrderItemOut
 from dependencies.auth import get_current_user
+from core.cache import drop, DASHBOARD_NAMESPACE
+from services import collection_versions, sales_rollup, stock_alerts, stock_ledger
+from services.idempotency import fingerprint, idempotency_store
+from utils.pagination import keyset_query, keyset_sort, set_page_headers, count_cache
+from utils.serialization import parse_fields, projection_for, list_response
+from pymongo import UpdateOne
 from datetime import datetime
 import uuid
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
+
+def transaction_conflict_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="These products are being updated by other orders, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
 # -------------------
 # Create a new order
 # -------------------
 @router.post("/", response_model=OrderOut)
-async def create_order(order: OrderCreate, current_user: dict = Depends(get_current_user)):
-    order_items = []
-    total = 0.0
-    updated_products = []  # track stock changes for rollback
+async def create_order(
+    order: OrderCreate,
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+):
+    """
+    Retried requests carrying the same Idempotency-Key get the first request's
+    order back (with `Idempotent-Replayed: true`) instead of placing it again.
+    """
+    if not idempotency_key:
+        return await _place_order(order, current_user)
+
+    claim = await idempotency_store.begin(current_user["id"], idempotency_key, fingerprint(order.model_dump_json()))
+    if claim.replay is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+        return OrderOut(**claim.replay)
 
     try:
-        for item in order.items:
-            # Fetch product
-            product = await db["products"].find_one({"id": item.product_id, "is_active": True})
-            if not product:
-                raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
+        created = await _place_order(order, current_user, claim)
+    except BaseException as e:
+        await claim.failed(e)
+        raise
+    claim.succeeded(created.model_dump(mode="json"))
+    return created
 
-            if product["stock"] < item.quantity:
-                raise HTTPException(status_code=400, detail=f"Not enough stock for {product['name']}")
 
-            subtotal = product["price"] * item.quantity
-            total += subtotal
+async def _place_order(order: OrderCreate, current_user: dict, claim=None) -> OrderOut:
+    # Total quantity per product (the same product may appear on several lines)
+    requested = {}
+    for item in order.items:
+        requested[item.product_id] = requested.get(item.product_id, 0) + item.quantity
 
-            # Deduct stock (safe check stock >= qty again)
-            result = await db["products"].update_one(
-                {"id": product["id"], "stock": {"$gte": item.quantity}},
-                {"$inc": {"stock": -item.quantity}}
-            )
-            if result.modified_count == 0:
-                raise HTTPException(status_code=400, detail=f"Stock update failed for {product['name']}")
+    # Stock decrements and the order insert commit or abort together; on a write
+    # conflict with a concurrent order the whole transaction is re-run
+    async def place(session):
+        # Fetch every product in one round trip
+        products = await db["products"].find(
+            {"id": {"$in": list(requested)}, "is_active": True},
+            session=session
+        ).to_list(length=None)
+        products_by_id = {p["id"]: p for p in products}
 
-            updated_products.append((product["id"], item.quantity))
+        for product_id, quantity in requested.items():
+            product = products_by_id.get(product_id)
+            if not product:
+                raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+            if product["stock"] < quantity:
+                raise HTTPException(status_code=400, detail=f"Not enough stock for {product['name']}")
 
+        order_items = []
+        total = 0.0
+        for item in order.items:
+            product = products_by_id[item.product_id]
+            subtotal = product["price"] * item.quantity
+            total += subtotal
             order_items.append(OrderItemOut(
                 product_id=product["id"],
                 product_name=product["name"],
@@ -47,37 +92,89 @@ async def create_order(order: OrderCreate, current_user: dict = Depends(get_curr
                 subtotal=subtotal
             ))
 
+        # Deduct stock in one batch (safe check stock >= qty again)
+        if requested:
+            result = await db["products"].bulk_write(
+                [
+                    UpdateOne(
+                        {"id": product_id, "stock": {"$gte": quantity}},
+                        [{"$set": {"stock": {"$subtract": ["$stock", quantity]}}}, stock_alerts.FLAG_STAGE]
+                    )
+                    for product_id, quantity in requested.items()
+                ],
+                ordered=False,
+                session=session
+            )
+            if result.modified_count != len(requested):
+                raise HTTPException(status_code=400, detail="Stock update failed, please retry the order")
+
+        order_id = str(uuid.uuid4())
+        created_at = datetime.utcnow()
         new_order = {
-            "id": str(uuid.uuid4()),
+            "id": order_id,
             "customer_name": order.customer_name,
             "customer_phone": order.customer_phone,
             "customer_email": order.customer_email,
             "customer_address": order.customer_address,
             "items": [item.dict() for item in order_items],
             "total": total,
-            "created_at": datetime.utcnow(),
+            "created_at": created_at,
             "created_by_id": current_user["id"],
             "created_by_username": current_user["username"],
             "status": "completed"
         }
 
-        await db["orders"].insert_one(new_order)
-        return OrderOut(**new_order)
+        await db["orders"].insert_one(new_order, session=session)
+        created = OrderOut(**new_order)
+        if claim:
+            # Commits with the order, so a replay can never miss an order that exists
+            await claim.complete(created.model_dump(mode="json"), session=session)
+        await sales_rollup.record_order(new_order, session=session)
+        await stock_ledger.record([
+            stock_ledger.movement(product_id, -quantity, f"Order {order_id}", current_user, created_at)
+            for product_id, quantity in requested.items()
+        ], session=session)
+        return new_order, created, products_by_id
 
-    except Exception as e:
-        # Rollback product stock
-        for product_id, qty in updated_products:
-            await db["products"].update_one({"id": product_id}, {"$inc": {"stock": qty}})
-        raise e
+    try:
+        new_order, created, products_by_id = await run_transaction(place)
+    except TransactionConflict:
+        raise transaction_conflict_error()
+
+    # Live dashboard delta, plus alerts for products this order pushed to their reorder level
+    published = [sales_rollup.order_event(new_order)]
+    for product_id, quantity in requested.items():
+        product = products_by_id[product_id]
+        published.append(stock_alerts.crossing(product, product["stock"], product["stock"] - quantity))
+    # Caches and versions first, so they stay correct whatever happens to the events;
+    # the version announcements go out in the same insert as the order's events
+    cache_versions = await drop(DASHBOARD_NAMESPACE)
+    await collection_versions.changed("orders", "products", *cache_versions, publish=[e for e in published if e])
+    return created
 
 
 # -------------------
 # Get all orders
 # -------------------
-@router.get("/", response_model=list[OrderOut])
-async def list_orders(current_user: dict = Depends(get_current_user)):
-    orders = await db["orders"].find().sort("created_at", -1).to_list(100)
-    return [OrderOut(**o) for o in orders]
+@router.get("/", response_model=list[OrderOut], response_class=ORJSONResponse)
+async def list_orders(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    include_total: bool = Query(False),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,total,created_at"),
+    current_user: dict = Depends(get_current_user)
+):
+    selected = parse_fields(fields, OrderOut)
+    projection = projection_for(selected, always=("id", "created_at"))
+
+    # Newest first; the cursor continues from the last order of the previous page
+    query = keyset_query({}, "created_at", True, cursor)
+    orders = await db["orders"].find(query, projection).sort(keyset_sort("created_at", True)).limit(limit).to_list(limit)
+
+    total = await count_cache.count(db["orders"], {}) if include_total else None
+    response = list_response(orders, OrderOut, selected)
+    set_page_headers(response, orders, limit, "created_at", total)
+    return response
 
 
 # -------------------
@@ -103,15 +200,56 @@ async def cancel_order(order_id: str, current_user: dict = Depends(get_current_u
     if order["status"] == "cancelled":
         raise HTTPException(status_code=400, detail="Order already cancelled")
 
-    # Restore stock
+    restored = {}
     for item in order["items"]:
-        await db["products"].update_one(
-            {"id": item["product_id"]},
-            {"$inc": {"stock": item["quantity"]}}
+        restored[item["product_id"]] = restored.get(item["product_id"], 0) + item["quantity"]
+
+    async def cancel(session):
+        # Update order status (guarded so a concurrent cancel cannot restore stock twice)
+        result = await db["orders"].update_one(
+            {"id": order_id, "status": {"$ne": "cancelled"}},
+            {"$set": {"status": "cancelled"}},
+            session=session
         )
+        if result.modified_count == 0:
+            raise HTTPException(status_code=400, detail="Order already cancelled")
+
+        # Current levels, to tell which products the restore lifts above their reorder level
+        products = await db["products"].find(
+            {"id": {"$in": list(restored)}},
+            {"id": 1, "name": 1, "stock": 1, "reorder_level": 1},
+            session=session
+        ).to_list(length=None)
+
+        # Restore stock in one batch
+        if restored:
+            await db["products"].bulk_write(
+                [
+                    UpdateOne({"id": product_id}, [{"$set": {"stock": {"$add": ["$stock", quantity]}}}, stock_alerts.FLAG_STAGE])
+                    for product_id, quantity in restored.items()
+                ],
+                ordered=False,
+                session=session
+            )
+        await stock_ledger.record([
+            stock_ledger.movement(product_id, quantity, f"Order {order_id} cancelled", current_user)
+            for product_id, quantity in restored.items()
+        ], session=session)
+        await sales_rollup.record_order(order, sign=-1, session=session)
+        return products
+
+    try:
+        products = await run_transaction(cancel)
+    except TransactionConflict:
+        raise transaction_conflict_error()
 
-    # Update order status
-    await db["orders"].update_one({"id": order_id}, {"$set": {"status": "cancelled"}})
+    published = [sales_rollup.order_event(order, sign=-1)]
+    for product in products:
+        published.append(stock_alerts.crossing(product, product["stock"], product["stock"] + restored[product["id"]]))
+    # Caches and versions first, so they stay correct whatever happens to the events;
+    # the version announcements go out in the same insert as the order's events
+    cache_versions = await drop(DASHBOARD_NAMESPACE)
+    await collection_versions.changed("orders", "products", *cache_versions, publish=[e for e in published if e])
     order["status"] = "cancelled"
     return OrderOut(**order)
 
@@ -129,5 +267,6 @@ async def mark_order_pending(order_id: str, current_user: dict = Depends(get_cur
         raise HTTPException(status_code=400, detail="Only completed orders can be moved to pending")
 
     await db["orders"].update_one({"id": order_id}, {"$set": {"status": "pending"}})
+    await collection_versions.changed("orders")
     order["status"] = "pending"
     return OrderOut(**order)
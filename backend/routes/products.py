@@ -1,12 +1,24 @@
 # routes/products.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi.responses import ORJSONResponse
+from typing import List, Literal, Optional
 from datetime import datetime
-import re
 import uuid
 
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
 from db import db
+from core.config import settings
+from core.indexes import CASE_INSENSITIVE
+from core.cache import drop, DASHBOARD_NAMESPACE
+from services import collection_versions, product_import, product_search, stock_alerts, stock_ledger
+from services.category_index import category_index
+from utils.pagination import keyset_query, keyset_sort, set_page_headers, count_cache
+from utils.serialization import parse_fields, projection_for, list_response
+from utils.http_cache import Validators
 from dependencies.auth import get_current_user
+from dependencies.conditional import conditional_get
 
 from models.product import ProductCreate, ProductUpdate, ProductOut
 from models.category import CategoryOut
@@ -26,12 +38,20 @@ def require_owner(current_user: dict):
 # Helper: Validate Category
 # -------------------
 async def get_category_or_404(category_id: str) -> CategoryOut:
-    category = await db["categories"].find_one({"id": category_id})
+    category = await category_index.get(category_id)
     if not category:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid category_id")
     return CategoryOut(**category)
 
 
+# -------------------
+# Helper: After a write
+# -------------------
+async def products_changed():
+    """Drop cached responses derived from products (dashboard inventory figures, inventory reports)."""
+    await collection_versions.changed("products", *await drop(DASHBOARD_NAMESPACE))
+
+
 # -------------------
 # Create product
 # -------------------
@@ -43,55 +63,147 @@ async def create_product(product: ProductCreate, current_user: dict = Depends(ge
     if product.category_id:
         await get_category_or_404(product.category_id)
 
-    # Duplicate name check within same category (case-insensitive)
-    ci_name_regex = {"$regex": f"^{re.escape(product.name)}$", "$options": "i"}
-    query = {"name": ci_name_regex}
-    if product.category_id:
-        query["category_id"] = product.category_id
-
-    if await db["products"].find_one(query):
+    # Duplicate name check within same category (case-insensitive, served by the collated unique index)
+    query = {"category_id": product.category_id, "name": product.name}
+    if await db["products"].find_one(query, collation=CASE_INSENSITIVE):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Product with this name already exists in the category")
 
     product_data = product.dict()
+    product_data.update(product_search.build_search_fields(product.name, product.description))
     product_data.update({
         "id": str(uuid.uuid4()),
         "created_at": datetime.utcnow(),
         "updated_at": None
     })
+    product_data[stock_alerts.FLAG] = stock_alerts.is_below(product.stock, stock_alerts.reorder_level(product_data))
 
-    await db["products"].insert_one(product_data)
+    try:
+        await db["products"].insert_one(product_data)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Product with this name already exists in the category")
+    await stock_ledger.record([
+        stock_ledger.movement(product_data["id"], product.stock, "Initial stock", current_user, product_data["created_at"])
+    ])
+    await products_changed()
+    # A product created at or below its level adds to the low-stock count like a crossing
+    await stock_alerts.raise_alerts([stock_alerts.created(product_data)])
     return ProductOut(**product_data)
 
 
+# -------------------
+# Bulk import (CSV / NDJSON)
+# -------------------
+@router.post("/import")
+async def import_products(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Detected from the file name when omitted"),
+    chunk_size: int = Query(product_import.DEFAULT_CHUNK_SIZE, ge=1, le=10000),
+    current_user: dict = Depends(get_current_user)
+):
+    require_owner(current_user)
+
+    fmt = format or product_import.detect_format(file.filename, file.content_type)
+    if not fmt:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported file type, upload .csv or .ndjson")
+
+    report = await product_import.import_products(file.file, fmt, current_user, chunk_size=chunk_size)
+    if report["inserted"] or report["updated"]:
+        await products_changed()
+    return report
+
+
 # -------------------
 # List products
 # -------------------
-@router.get("/", response_model=List[ProductOut])
+# Sort options: field, descending
+PRODUCT_SORTS = {
+    "name": ("name", False),
+    "created_at": ("created_at", True),
+}
+
+
+# Maintained search token arrays are never returned to clients
+SEARCH_FIELDS_EXCLUDED = {"name_terms": 0, "search_terms": 0}
+
+
+@router.get("/", response_model=List[ProductOut], response_class=ORJSONResponse)
 async def list_products(
-    skip: int = Query(0, ge=0),
+    skip: int = Query(0, ge=0, description="Offset paging (ignored when a cursor is given)"),
     limit: int = Query(25, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    sort: Literal["name", "created_at"] = Query("name"),
+    include_total: bool = Query(False),
     active_only: bool = Query(True),
     category_id: Optional[str] = Query(None),
     category_name: Optional[str] = Query(None),
-    search: Optional[str] = Query(None)
+    search: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name,price"),
+    # category_name filters through the category index, so category writes change the result too
+    validators: Optional[Validators] = Depends(
+        conditional_get("products", "categories", cache_control=settings.PRODUCTS_CACHE_CONTROL)
+    ),
 ):
+    selected = parse_fields(fields, ProductOut)
     query = {}
     if active_only:
         query["is_active"] = True
     if category_id:
         query["category_id"] = category_id
     if category_name:
-        category = await db["categories"].find_one({"name": {"$regex": re.escape(category_name), "$options": "i"}})
+        category = await category_index.find_by_name_fragment(category_name)
         if category:
             query["category_id"] = category["id"]
         else:
-            return []  # No category match
+            # No category match
+            response = list_response([], ProductOut, selected)
+            if validators:
+                response.headers.update(validators.headers)
+            return response
     if search:
-        query["name"] = {"$regex": re.escape(search), "$options": "i"}
+        query.update(product_search.search_filter(search))
+
+    field, descending = PRODUCT_SORTS[sort]
+    projection = projection_for(selected, always=("id", field), exclude=SEARCH_FIELDS_EXCLUDED)
+    find = db["products"].find(keyset_query(query, field, descending, cursor), projection)
+    find = find.sort(keyset_sort(field, descending))
+    if not cursor and skip:
+        find = find.skip(skip)
+    results = await find.limit(limit).to_list(length=limit)
+
+    total = await count_cache.count(db["products"], query) if include_total else None
+    response = list_response(results, ProductOut, selected)
+    set_page_headers(response, results, limit, field, total)
+    if validators:
+        response.headers.update(validators.headers)
+    return response
+
+
+# -------------------
+# Search products (ranked, with category facets)
+# -------------------
+@router.get("/search")
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(25, ge=1, le=200),
+    active_only: bool = Query(True),
+    category_id: Optional[str] = Query(None)
+):
+    query = {}
+    if active_only:
+        query["is_active"] = True
+    if category_id:
+        query["category_id"] = category_id
 
-    cursor = db["products"].find(query).skip(skip).limit(limit)
-    results = await cursor.to_list(length=limit)
-    return [ProductOut(**r) for r in results]
+    data = await product_search.search_products(q, query, skip=skip, limit=limit)
+    for facet in data["facets"]["categories"]:
+        category = await category_index.get(facet["category_id"]) if facet["category_id"] else None
+        facet["category_name"] = category["name"] if category else None
+    return {
+        "results": [ProductOut(**r) for r in data["results"]],
+        "total": data["total"],
+        "facets": data["facets"],
+    }
 
 
 # -------------------
@@ -99,7 +211,7 @@ async def list_products(
 # -------------------
 @router.get("/{product_id}", response_model=ProductOut)
 async def get_product(product_id: str, current_user: dict = Depends(get_current_user)):
-    product = await db["products"].find_one({"id": product_id})
+    product = await db["products"].find_one({"id": product_id}, SEARCH_FIELDS_EXCLUDED)
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
     return ProductOut(**product)
@@ -120,28 +232,70 @@ async def update_product(product_id: str, product: ProductUpdate, current_user:
     if "category_id" in update_data and update_data["category_id"]:
         await get_category_or_404(update_data["category_id"])
 
+    existing_product = None
+    if "name" in update_data or "description" in update_data:
+        existing_product = await db["products"].find_one({"id": product_id})
+        if not existing_product:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+
     # Duplicate check if name changes
     if "name" in update_data:
-        ci_name_regex = {"$regex": f"^{re.escape(update_data['name'])}$", "$options": "i"}
-        duplicate_query = {"name": ci_name_regex, "id": {"$ne": product_id}}
+        duplicate_query = {"name": update_data["name"], "id": {"$ne": product_id}}
 
         # Use updated category_id if provided, else existing
-        if "category_id" in update_data and update_data["category_id"]:
+        if "category_id" in update_data:
             duplicate_query["category_id"] = update_data["category_id"]
         else:
-            existing_product = await db["products"].find_one({"id": product_id})
-            if existing_product and existing_product.get("category_id"):
-                duplicate_query["category_id"] = existing_product["category_id"]
+            duplicate_query["category_id"] = existing_product.get("category_id")
 
-        if await db["products"].find_one(duplicate_query):
+        if await db["products"].find_one(duplicate_query, collation=CASE_INSENSITIVE):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Another product with this name exists in the category")
 
+    # Keep search tokens in sync with name/description
+    if "name" in update_data or "description" in update_data:
+        update_data.update(product_search.build_search_fields(
+            update_data.get("name", existing_product.get("name")),
+            update_data.get("description", existing_product.get("description")),
+        ))
+
     update_data["updated_at"] = datetime.utcnow()
 
-    result = await db["products"].update_one({"id": product_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    try:
+        # Pipeline update so the low-stock flag is recomputed from the new values in the
+        # same write ($literal keeps strings such as "$5 off" from reading as field paths).
+        # Returns the stock level and threshold the update replaced.
+        previous = await db["products"].find_one_and_update(
+            {"id": product_id},
+            [{"$set": {k: {"$literal": v} for k, v in update_data.items()}}, stock_alerts.FLAG_STAGE],
+            projection={"id": 1, "name": 1, "stock": 1, "reorder_level": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Another product with this name exists in the category")
+    if previous is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
 
+    # Stock overwrites are recorded as the difference from the previous level
+    if "stock" in update_data:
+        await stock_ledger.record([
+            stock_ledger.movement(
+                product_id,
+                update_data["stock"] - int(previous.get("stock", 0)),
+                "Manual stock adjustment",
+                current_user,
+                update_data["updated_at"],
+            )
+        ])
+    await products_changed()
+    if "stock" in update_data or "reorder_level" in update_data:
+        previous_stock = int(previous.get("stock", 0))
+        await stock_alerts.raise_alerts([stock_alerts.crossing(
+            previous,
+            previous_stock,
+            update_data.get("stock", previous_stock),
+            stock_alerts.reorder_level(update_data) if "reorder_level" in update_data else None,
+        )])
+
     updated = await db["products"].find_one({"id": product_id})
     return ProductOut(**updated)
 
@@ -159,6 +313,7 @@ async def activate_product(product_id: str, current_user: dict = Depends(get_cur
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    await products_changed()
 
     updated = await db["products"].find_one({"id": product_id})
     return ProductOut(**updated)
@@ -177,6 +332,7 @@ async def deactivate_product(product_id: str, current_user: dict = Depends(get_c
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    await products_changed()
 
     updated = await db["products"].find_one({"id": product_id})
     return ProductOut(**updated)
@@ -189,9 +345,14 @@ async def deactivate_product(product_id: str, current_user: dict = Depends(get_c
 async def delete_product(product_id: str, current_user: dict = Depends(get_current_user)):
     require_owner(current_user)
 
-    result = await db["products"].delete_one({"id": product_id})
-    if result.deleted_count == 0:
+    deleted = await db["products"].find_one_and_delete({"id": product_id}, projection={"stock": 1})
+    if deleted is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    # Close the product's ledger, so /stock/at reports nothing left after the delete
+    await stock_ledger.record([
+        stock_ledger.movement(product_id, -int(deleted.get("stock", 0)), "Product deleted", current_user)
+    ])
+    await products_changed()
 
     return {"message": "Product deleted successfully"}
 
@@ -1,22 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, Query
-from db import db
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from db import db, reporting_db
 from dependencies.auth import get_current_user
-from utils.pdf_utils import generate_sales_report_pdf, generate_inventory_report_pdf
+from services import collection_versions
+from services.report_cache import report_cache
+from utils.http_cache import etag_matches, not_modified
+from utils.pdf_utils import render_pool, RenderQueueFull
+from utils.export_utils import stream_export, export_filename, export_media_type
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
+COMPANY_NAME = "INC Product Inventory Management System"
 
-@router.get("/sales/pdf")
-async def get_sales_report_pdf(
-    start_date: Optional[datetime] = Query(None),
-    end_date: Optional[datetime] = Query(None),
-    current_user: dict = Depends(get_current_user)
-):
+# Browsers keep the PDF but revalidate it (If-None-Match) on every download
+REPORT_CACHE_CONTROL = "private, no-cache"
+
+
+# -------------------
+# Helpers
+# -------------------
+def require_owner(current_user: dict, detail: str):
     if current_user["role"] != "owner":
-        raise HTTPException(status_code=403, detail="Only owners can download sales reports")
+        raise HTTPException(status_code=403, detail=detail)
+
 
+def created_at_query(start_date: Optional[datetime], end_date: Optional[datetime]) -> dict:
     query = {}
     if start_date and end_date:
         query["created_at"] = {"$gte": start_date, "$lte": end_date}
@@ -24,52 +34,254 @@ async def get_sales_report_pdf(
         query["created_at"] = {"$gte": start_date}
     elif end_date:
         query["created_at"] = {"$lte": end_date}
+    return query
+
+
+async def load_sales_report_args(start_date: Optional[datetime], end_date: Optional[datetime], session=None) -> tuple:
+    """Fetch orders for the sales report and return (args, kwargs) for the renderer."""
+    query = created_at_query(start_date, end_date)
 
     # fetch only required fields
     projection = {"customer_name": 1, "created_at": 1, "items": 1, "status": 1, "total": 1}
-    orders = await db["orders"].find(query, projection).sort("created_at", -1).to_list(500)
+    orders = await reporting_db["orders"].find(query, projection, session=session).sort("created_at", -1).to_list(500)
 
     if not orders:
         raise HTTPException(status_code=404, detail="No orders found for given period")
 
-    pdf_content = generate_sales_report_pdf(
-        orders,
-        company_name="INC Product Inventory Management System",
-        logo_url="logo.png",
-        start_date=start_date.strftime("%Y-%m-%d") if start_date else None,
-        end_date=end_date.strftime("%Y-%m-%d") if end_date else None,
-    )
+    return (orders,), {
+        "company_name": COMPANY_NAME,
+        "logo_url": "logo.png",
+        "start_date": start_date.strftime("%Y-%m-%d") if start_date else None,
+        "end_date": end_date.strftime("%Y-%m-%d") if end_date else None,
+    }
+
+
+async def load_inventory_report_args(session=None) -> tuple:
+    """Fetch products for the inventory report and return (args, kwargs) for the renderer."""
+    projection = {"name": 1, "description": 1, "price": 1, "stock": 1, "reorder_level": 1, "is_active": 1}
+    products = await reporting_db["products"].find({}, projection, session=session).sort("name", 1).to_list(1000)
+
+    if not products:
+        raise HTTPException(status_code=404, detail="No products found")
 
-    filename = f"sales_report_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return (products,), {"company_name": COMPANY_NAME, "logo_url": "logo.png"}
+
+
+def report_filename(kind: str) -> str:
+    return f"{kind}_report_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.pdf"
+
+
+def pdf_response(content: bytes, filename: str, headers: Optional[dict] = None) -> Response:
     return Response(
-        content=pdf_content,
+        content=content,
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        headers={"Content-Disposition": f"attachment; filename={filename}", **(headers or {})}
+    )
+
+
+def queue_full_error() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Report renderer is busy, please try again shortly",
+        headers={"Retry-After": "5"},
+    )
+
+
+def job_status(job: dict) -> dict:
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "error": job["error"],
+        "filename": job["filename"],
+    }
+
+
+async def cached_pdf_response(request: Request, kind: str, params: dict, collection: str, load_args) -> Response:
+    """
+    Serve a report from the report cache (304 when the client's copy is current),
+    rendering and caching it on a miss.
+
+    The version read and the data reads share a causally consistent session, so
+    even on a lagging secondary the data includes every write the version counts.
+    """
+    async with await db.client.start_session(causal_consistency=True) as session:
+        versions = await collection_versions.snapshot([collection], session=session)
+        key = report_cache.key(kind, params, versions)
+
+        cached = await report_cache.lookup(key)
+        if cached:
+            headers = {"ETag": cached.etag, "Cache-Control": REPORT_CACHE_CONTROL}
+            if etag_matches(request.headers.get("if-none-match"), cached.etag):
+                return not_modified(headers)
+            content = await report_cache.read(cached)
+            if content is not None:
+                return pdf_response(content, report_filename(kind), headers)
+
+        args, kwargs = await load_args(session=session)
+
+    async def render() -> bytes:
+        return await render_pool.render(kind, *args, **kwargs)
+
+    try:
+        content, etag = await report_cache.render_once(key, render)
+    except RenderQueueFull:
+        raise queue_full_error()
+
+    return pdf_response(content, report_filename(kind), {"ETag": etag, "Cache-Control": REPORT_CACHE_CONTROL})
+
+
+# -------------------
+# Direct downloads
+# -------------------
+@router.get("/sales/pdf")
+async def get_sales_report_pdf(
+    request: Request,
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    current_user: dict = Depends(get_current_user)
+):
+    require_owner(current_user, "Only owners can download sales reports")
+
+    params = {
+        "start_date": start_date.isoformat() if start_date else None,
+        "end_date": end_date.isoformat() if end_date else None,
+    }
+    return await cached_pdf_response(
+        request, "sales", params, "orders",
+        lambda session: load_sales_report_args(start_date, end_date, session=session),
     )
 
 
 @router.get("/inventory/pdf")
 async def get_inventory_report_pdf(
+    request: Request,
     current_user: dict = Depends(get_current_user)
 ):
-    if current_user["role"] != "owner":
-        raise HTTPException(status_code=403, detail="Only owners can download inventory reports")
+    require_owner(current_user, "Only owners can download inventory reports")
+    return await cached_pdf_response(request, "inventory", {}, "products", load_inventory_report_args)
 
-    projection = {"name": 1, "description": 1, "price": 1, "stock": 1, "is_active": 1}
-    products = await db["products"].find({}, projection).sort("name", 1).to_list(1000)
 
-    if not products:
-        raise HTTPException(status_code=404, detail="No products found")
+# -------------------
+# Background jobs: submit, poll, download
+# -------------------
+@router.post("/sales/jobs", status_code=202)
+async def submit_sales_report_job(
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    current_user: dict = Depends(get_current_user)
+):
+    require_owner(current_user, "Only owners can download sales reports")
+    args, kwargs = await load_sales_report_args(start_date, end_date)
 
-    pdf_content = generate_inventory_report_pdf(
-        products,
-        company_name="INC Product Inventory Management System",
-        logo_url="logo.png"
-    )
+    try:
+        job = render_pool.submit("sales", current_user["id"], report_filename("sales"), *args, **kwargs)
+    except RenderQueueFull:
+        raise queue_full_error()
 
-    filename = f"inventory_report_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.pdf"
-    return Response(
-        content=pdf_content,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    return job_status(job)
+
+
+@router.post("/inventory/jobs", status_code=202)
+async def submit_inventory_report_job(
+    current_user: dict = Depends(get_current_user)
+):
+    require_owner(current_user, "Only owners can download inventory reports")
+    args, kwargs = await load_inventory_report_args()
+
+    try:
+        job = render_pool.submit("inventory", current_user["id"], report_filename("inventory"), *args, **kwargs)
+    except RenderQueueFull:
+        raise queue_full_error()
+
+    return job_status(job)
+
+
+def get_job_or_404(job_id: str, current_user: dict) -> dict:
+    job = render_pool.get(job_id)
+    if not job or job["owner_id"] != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def get_report_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    return job_status(get_job_or_404(job_id, current_user))
+
+
+@router.get("/jobs/{job_id}/download")
+async def download_report_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = get_job_or_404(job_id, current_user)
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail="Report generation failed")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail="Report is not ready yet")
+
+    # Served from the shared job directory, whichever worker rendered it
+    return FileResponse(render_pool.result_path(job_id), media_type="application/pdf", filename=job["filename"])
+
+
+# -------------------
+# Streaming exports (CSV / NDJSON, optional gzip)
+# -------------------
+SALES_EXPORT_COLUMNS = [
+    "id", "created_at", "customer_name", "customer_phone", "customer_email",
+    "status", "items_count", "total", "created_by_username",
+]
+INVENTORY_EXPORT_COLUMNS = ["id", "name", "description", "category_id", "price", "stock", "is_active", "created_at"]
+
+
+def export_response(cursor, kind: str, columns: list, fmt: str, gzip: bool, transform=None) -> StreamingResponse:
+    return StreamingResponse(
+        stream_export(cursor, columns, fmt, gzip=gzip, transform=transform),
+        media_type=export_media_type(fmt, gzip),
+        headers={"Content-Disposition": f"attachment; filename={export_filename(kind, fmt, gzip)}"}
     )
+
+
+def _sales_export_row(order: dict) -> dict:
+    order["items_count"] = len(order.get("items") or [])
+    return order
+
+
+@router.get("/sales/export")
+async def export_sales(
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    status: Optional[Literal["completed", "pending", "cancelled"]] = Query(None),
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    gzip: bool = Query(False),
+    current_user: dict = Depends(get_current_user)
+):
+    require_owner(current_user, "Only owners can export sales")
+
+    query = created_at_query(start_date, end_date)
+    if status:
+        query["status"] = status
+    projection = {c: 1 for c in SALES_EXPORT_COLUMNS if c != "items_count"}
+    projection.update({"items": 1, "_id": 0})
+    cursor = reporting_db["orders"].find(query, projection).sort("created_at", -1)
+
+    return export_response(cursor, "sales", SALES_EXPORT_COLUMNS, format, gzip, _sales_export_row)
+
+
+@router.get("/inventory/export")
+async def export_inventory(
+    status: Optional[Literal["active", "inactive"]] = Query(None),
+    category_id: Optional[str] = Query(None),
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    gzip: bool = Query(False),
+    current_user: dict = Depends(get_current_user)
+):
+    require_owner(current_user, "Only owners can export inventory")
+
+    query = {}
+    if status:
+        query["is_active"] = status == "active"
+    if category_id:
+        query["category_id"] = category_id
+    projection = {c: 1 for c in INVENTORY_EXPORT_COLUMNS}
+    projection["_id"] = 0
+    cursor = reporting_db["products"].find(query, projection).sort([("name", 1), ("id", 1)])
+
+    return export_response(cursor, "inventory", INVENTORY_EXPORT_COLUMNS, format, gzip)
@@ -0,0 +1,78 @@
+# routes/stock.py
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import Optional
+from datetime import datetime
+
+from dependencies.auth import get_current_user, get_current_user_for_stream
+from models.stock import StockOperation
+from services import events, stock_alerts, stock_ledger
+from utils.sse import sse_response
+
+router = APIRouter(prefix="/stock", tags=["stock"])
+
+
+# -------------------
+# Movement history
+# -------------------
+@router.get("/movements", response_model=list[StockOperation])
+async def list_movements(
+    product_id: Optional[str] = Query(None),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: dict = Depends(get_current_user)
+):
+    movements = await stock_ledger.history(product_id, start_date, end_date, limit)
+    return [StockOperation(**m) for m in movements]
+
+
+# -------------------
+# Point-in-time stock
+# -------------------
+@router.get("/at")
+async def get_stock_at(
+    at: datetime = Query(..., description="Point in time (UTC)"),
+    product_id: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_user)
+):
+    stock = await stock_ledger.stock_at(at, product_id)
+    if product_id and product_id not in stock:
+        raise HTTPException(status_code=404, detail="No stock history for this product at that time")
+    return {
+        "at": at,
+        "products": [{"product_id": pid, "stock": qty} for pid, qty in stock.items()],
+    }
+
+
+# -------------------
+# Checkpoint (owner only)
+# -------------------
+@router.post("/checkpoint")
+async def create_checkpoint(current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "owner":
+        raise HTTPException(status_code=403, detail="Only owners can create stock checkpoints")
+    written = await stock_ledger.checkpoint()
+    return {"snapshots_written": written}
+
+
+# -------------------
+# Reorder list (products at or below their reorder level)
+# -------------------
+@router.get("/alerts")
+async def list_low_stock(
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: dict = Depends(get_current_user)
+):
+    return await stock_alerts.below_threshold(limit)
+
+
+# -------------------
+# Low-stock alert stream (Server-Sent Events)
+# -------------------
+@router.get("/alerts/stream")
+async def stream_alerts(request: Request, current_user: dict = Depends(get_current_user_for_stream)):
+    """
+    Pushes a `stock_alert` event whenever a product crosses its reorder level
+    (state "low") or is restocked above it (state "restocked").
+    """
+    return sse_response(request, events.hub.subscribe([stock_alerts.EVENT_TYPE]))
@@ -1,24 +1,61 @@
 # routes/users.py
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from typing import Optional
 from models.user import UserOut, UserCreate, RoleUpdate
 from dependencies.auth import get_current_user
+from core.user_cache import user_cache
+from core.security import hash_password_async
+from utils.serialization import parse_fields, projection_for, list_response
 from db import db
+from core.config import settings
+from core.indexes import CASE_INSENSITIVE
 import shutil, os
 import uuid
 
 router = APIRouter(prefix="/users", tags=["users"])
-UPLOAD_DIR = "static/uploads"
+UPLOAD_DIR = settings.UPLOAD_DIR
+UPLOAD_URL_PREFIX = "/static/uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+
+def save_upload(upload: UploadFile, prefix: str) -> str:
+    """
+    Store an upload under a unique name and return that name. Written to a temp
+    file and renamed into place, so concurrent workers never see a partial file.
+    """
+    original = os.path.basename(upload.filename or "upload")
+    filename = f"{prefix}_{uuid.uuid4().hex[:8]}_{original}"
+    tmp_path = os.path.join(UPLOAD_DIR, f".{filename}.tmp")
+    with open(tmp_path, "wb") as f:
+        shutil.copyfileobj(upload.file, f)
+    os.replace(tmp_path, os.path.join(UPLOAD_DIR, filename))
+    return filename
+
 # ---------------------------
 # Get all users (owner only)
 # ---------------------------
-@router.get("", response_model=list[UserOut])
-async def list_users(current_user: dict = Depends(get_current_user)):
+@router.get("", response_model=list[UserOut], response_class=ORJSONResponse)
+async def list_users(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,username,role"),
+    current_user: dict = Depends(get_current_user)
+):
+    if current_user["role"] != "owner":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    selected = parse_fields(fields, UserOut)
+    projection = projection_for(selected, exclude=("hashed_password", "password"))
+    users = await db["users"].find({}, projection).to_list(100)
+    return list_response(users, UserOut, selected)
+
+# ---------------------------
+# User cache counters (owner only)
+# ---------------------------
+@router.get("/cache-stats")
+async def user_cache_stats(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "owner":
         raise HTTPException(status_code=403, detail="Not authorized")
-    users = await db["users"].find().to_list(100)
-    return [UserOut(**u) for u in users]
+    return user_cache.stats()
 
 # ---------------------------
 # Add a new user
@@ -28,11 +65,13 @@ async def add_user(user: UserCreate, current_user: dict = Depends(get_current_us
     if current_user["role"] != "owner":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    existing = await db["users"].find_one({"username": user.username})
+    existing = await db["users"].find_one({"username": user.username}, collation=CASE_INSENSITIVE)
     if existing:
         raise HTTPException(status_code=400, detail="Username already exists")
 
-    new_user = user.dict()
+    new_user = user.dict(exclude={"password"})
+    new_user["hashed_password"] = await hash_password_async(user.password)
+    new_user["dob"] = str(user.dob) if user.dob else None
     new_user["id"] = str(uuid.uuid4())
     new_user["is_active"] = True
     await db["users"].insert_one(new_user)
@@ -53,6 +92,7 @@ async def update_role(user_id: str, role_update: RoleUpdate, current_user: dict
     )
     if not updated:
         raise HTTPException(status_code=404, detail="User not found")
+    await user_cache.invalidate(user_id)
     return UserOut(**updated)
 
 # ---------------------------
@@ -70,6 +110,7 @@ async def toggle_active(user_id: str, is_active: bool, current_user: dict = Depe
     )
     if not updated:
         raise HTTPException(status_code=404, detail="User not found")
+    await user_cache.invalidate(user_id)
     return UserOut(**updated)
 
 # ---------------------------
@@ -83,19 +124,16 @@ async def update_profile_picture(
     if not profile_picture:
         raise HTTPException(status_code=400, detail="No file uploaded")
 
-    filename = f"{current_user['id']}_{profile_picture.filename}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-
-    with open(file_path, "wb") as f:
-        shutil.copyfileobj(profile_picture.file, f)
+    filename = await run_in_threadpool(save_upload, profile_picture, current_user["id"])
 
     await db["users"].update_one(
         {"id": current_user["id"]},
-        {"$set": {"profile_picture": f"/{UPLOAD_DIR}/{filename}"}}
+        {"$set": {"profile_picture": f"{UPLOAD_URL_PREFIX}/{filename}"}}
     )
 
     updated = await db["users"].find_one({"id": current_user["id"]})
     if not updated:
         raise HTTPException(status_code=404, detail="User not found")
 
+    await user_cache.invalidate(updated["id"])
     return UserOut(**updated)
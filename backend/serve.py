@@ -0,0 +1,51 @@
+# serve.py
+"""
+Multi-worker entry point: pre-forked uvicorn workers sharing one port.
+
+    cd backend
+    python serve.py                         # WEB_CONCURRENCY workers (default: one per core)
+    python serve.py --workers 4 --port 8000
+
+Each worker imports main:app and runs its own lifespan (Mongo pool, index
+check, category index) before it accepts connections. PDF render processes
+are only started by the first report (PDF_WARMUP=true starts them in the
+background at boot instead). On SIGTERM / SIGINT workers stop accepting and
+drain in-flight requests for up to GRACEFUL_SHUTDOWN_SECONDS. SIGHUP restarts the workers one
+at a time with the same drain (use it to reload after a deploy); SIGTTIN /
+SIGTTOU add or remove a worker.
+
+Per-worker state stays coherent across workers: the memory response cache,
+user cache and category index follow shared version counters in Mongo,
+report jobs and uploads live on disk, and live events go through the capped
+events collection. For several hosts use CACHE_BACKEND=redis.
+"""
+import argparse
+
+import uvicorn
+
+from core.config import settings
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.APP_PORT)
+    parser.add_argument("--workers", type=int, default=settings.WEB_CONCURRENCY)
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args()
+
+
+def main(args) -> None:
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=settings.GRACEFUL_SHUTDOWN_SECONDS,
+        proxy_headers=True,
+        log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,99 @@
+# services/category_index.py
+"""
+In-process index of all categories (a few hundred documents, rarely written).
+
+Maps id -> category and lowercased name -> id. Loaded at startup, reloaded by
+`invalidate()` after local writes, and kept coherent across workers through
+the shared "categories" version counter: every lookup first checks this
+worker's `collection_versions.tracker` and reloads when it is ahead of the
+version the index was loaded at. The conditional GET validators come from the
+same tracker, so a response never carries an ETag newer than its body.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from db import db
+from services import collection_versions
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "categories"
+
+
+class CategoryIndex:
+    def __init__(self):
+        self.version: Optional[int] = None
+        self._by_id: Dict[str, dict] = {}
+        self._by_name: Dict[str, str] = {}
+        self._ordered: List[dict] = []
+        self._lock = asyncio.Lock()
+
+    def _is_stale(self) -> bool:
+        if self.version is None:
+            return True
+        known = collection_versions.tracker.version(VERSION_KEY)
+        return known is not None and known > self.version
+
+    async def load(self) -> None:
+        """(Re)load every category from Mongo."""
+        async with self._lock:
+            await self._load()
+
+    async def _load(self) -> None:
+        # The counter is read first: a write landing in between only makes the
+        # index look older than it is, which costs one extra reload
+        version = await collection_versions.current(VERSION_KEY)
+        categories = await db["categories"].find({}, {"_id": 0}).to_list(length=None)
+        self._ordered = categories
+        self._by_id = {c["id"]: c for c in categories}
+        self._by_name = {c["name"].lower(): c["id"] for c in categories}
+        self.version = version
+        logger.info("Loaded %d categories (version %s)", len(categories), version)
+
+    async def ensure_fresh(self) -> None:
+        """Reload if never loaded or the tracker has seen a newer version."""
+        if not self._is_stale():
+            return
+        async with self._lock:
+            # Concurrent lookups wait for one reload instead of each doing their own
+            if self._is_stale():
+                await self._load()
+
+    async def invalidate(self) -> None:
+        """Call after writing categories: tell every worker, then reload here."""
+        await collection_versions.bump(VERSION_KEY)
+        await self.load()
+
+    # Lookups (call ensure_fresh() first)
+    async def get(self, category_id: str) -> Optional[dict]:
+        await self.ensure_fresh()
+        return self._by_id.get(category_id)
+
+    async def id_for_name(self, name: str) -> Optional[str]:
+        """Exact, case-insensitive name lookup."""
+        await self.ensure_fresh()
+        return self._by_name.get(name.strip().lower())
+
+    async def find_by_name_fragment(self, fragment: str) -> Optional[dict]:
+        """First category whose name contains `fragment` (case-insensitive)."""
+        await self.ensure_fresh()
+        exact = self._by_name.get(fragment.strip().lower())
+        if exact:
+            return self._by_id[exact]
+        needle = fragment.lower()
+        return next((c for c in self._ordered if needle in c["name"].lower()), None)
+
+    async def all(self) -> List[dict]:
+        await self.ensure_fresh()
+        return list(self._ordered)
+
+    async def name_map(self) -> Dict[str, str]:
+        """id -> id and lowercased name -> id, for resolving either reference."""
+        await self.ensure_fresh()
+        mapping = {cid: cid for cid in self._by_id}
+        mapping.update(self._by_name)
+        return mapping
+
+
+category_index = CategoryIndex()
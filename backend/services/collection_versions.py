@@ -0,0 +1,155 @@
+# services/collection_versions.py
+"""
+Per-collection version counters stored in the `collection_versions` collection:
+
+    {"_id": "<collection name>", "version": int, "updated_at": datetime}
+
+Writers call `bump()` (or `changed()`) after changing a collection; readers
+compare versions to tell whether their in-memory or on-disk copies are stale.
+Every worker and replica sees the same counter, so one `_id` lookup keeps them
+all coherent.
+
+Bumps are also announced on the events collection, so `tracker` keeps each
+worker's in-memory copy current and conditional GETs can be answered without
+any Mongo round trip.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+
+from core.config import settings
+from db import db
+from services import events
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "collection_versions"
+EVENT_TYPE = "collection_version"
+
+
+async def _increment(name: str) -> dict:
+    doc = await db[COLLECTION].find_one_and_update(
+        {"_id": name},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    tracker.observe(name, doc["version"], doc["updated_at"])
+    return doc
+
+
+def _announcements(docs: List[dict]) -> List[dict]:
+    """Events for the other workers' trackers (a lost one is covered by their periodic resync)."""
+    return [
+        events.event(EVENT_TYPE, {"name": d["_id"], "version": d["version"], "updated_at": d.get("updated_at")})
+        for d in docs
+    ]
+
+
+async def bump(name: str) -> int:
+    """Increment and return the version of collection `name`."""
+    doc = await _increment(name)
+    await events.publish(_announcements([doc]))
+    return doc["version"]
+
+
+async def changed(*names: str, publish: Sequence[dict] = ()) -> None:
+    """
+    Bump each collection after a committed write and announce the new versions,
+    in the same insert as the write's own events (`publish`, e.g. order deltas).
+    Three round trips however many names: the bumps, a read of the new versions
+    and the events. Never fails the calling request.
+    """
+    docs = []
+    if names:
+        try:
+            now = datetime.utcnow()
+            await db[COLLECTION].bulk_write([
+                UpdateOne({"_id": name}, {"$inc": {"version": 1}, "$set": {"updated_at": now}}, upsert=True)
+                for name in names
+            ], ordered=False)
+            # Concurrent bumps may already be included: any version read back is a real one
+            docs = await db[COLLECTION].find({"_id": {"$in": list(names)}}).to_list(length=None)
+        except Exception as e:
+            logger.error(f"Could not bump the versions of {', '.join(names)}: {str(e)}")
+    for doc in docs:
+        tracker.observe(doc["_id"], doc["version"], doc.get("updated_at"))
+    await events.publish(_announcements(docs) + list(publish))
+
+
+async def current(name: str, session=None) -> int:
+    """Current version of collection `name` (0 if it was never bumped)."""
+    doc = await db[COLLECTION].find_one({"_id": name}, {"version": 1}, session=session)
+    return doc["version"] if doc else 0
+
+
+async def snapshot(names: Iterable[str], session=None) -> Dict[str, int]:
+    """Current versions of several collections in one round trip."""
+    names = list(names)
+    versions = {name: 0 for name in names}
+    async for doc in db[COLLECTION].find({"_id": {"$in": names}}, {"version": 1}, session=session):
+        versions[doc["_id"]] = doc["version"]
+    return versions
+
+
+class VersionTracker:
+    """
+    This worker's copy of every counter. Local bumps apply immediately, other
+    workers' arrive through the events tail, and a full resync every
+    `resync_seconds` covers events missed while the tail reconnected.
+    """
+
+    def __init__(self, resync_seconds: float):
+        self.resync_seconds = resync_seconds
+        self.loaded = False
+        self._versions: Dict[str, Tuple[int, Optional[datetime]]] = {}
+
+    def get(self, name: str) -> Optional[Tuple[int, Optional[datetime]]]:
+        """(version, updated_at) of `name`, or None until the first resync."""
+        if not self.loaded:
+            return None
+        return self._versions.get(name, (0, None))
+
+    def version(self, name: str) -> Optional[int]:
+        """Version of `name` only, or None until the first resync."""
+        known = self.get(name)
+        return known[0] if known else None
+
+    def observe(self, name: str, version: int, updated_at: Optional[datetime]) -> None:
+        known = self._versions.get(name)
+        if known is None or version > known[0]:
+            self._versions[name] = (version, updated_at)
+
+    async def resync(self) -> None:
+        async for doc in db[COLLECTION].find({}, {"version": 1, "updated_at": 1}):
+            self.observe(doc["_id"], doc["version"], doc.get("updated_at"))
+        self.loaded = True
+
+    async def run(self) -> None:
+        """Follow bumps forever (started from the lifespan)."""
+        async with events.hub.subscribe([EVENT_TYPE]) as queue:
+            while True:
+                try:
+                    await self.resync()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Version resync failed: {str(e)}")
+                deadline = time.monotonic() + self.resync_seconds
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        event = await asyncio.wait_for(queue.get(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    payload = event["payload"]
+                    self.observe(payload["name"], payload["version"], payload.get("updated_at"))
+
+
+tracker = VersionTracker(settings.VERSION_RESYNC_SECONDS)
@@ -0,0 +1,292 @@
+# services/dashboard.py
+"""
+Dashboard summary and its live feed.
+
+`build_summary()` computes the figures served by GET /dashboard/ from the daily
+sales rollups and one products aggregation. `feed` keeps one summary per
+period in memory for /dashboard/stream: it is built once, then kept current by
+applying "sales_delta" and "stock_alert" events (services/events.py), and each
+change is fanned out to every connected client as a delta. However many
+dashboards are open, the aggregations run once per period per refresh.
+"""
+import asyncio
+import copy
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from bson.decimal128 import Decimal128
+
+from core.config import settings
+from db import db, reporting_db
+from services import collection_versions, events, sales_rollup, stock_alerts
+
+logger = logging.getLogger(__name__)
+
+
+def _to_float(value) -> float:
+    if value is None:
+        return 0.0
+
+    try:
+        if isinstance(value, Decimal128):
+            decimal_val = value.to_decimal()
+            return float(str(decimal_val))
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            cleaned = value.replace('$', '').replace(',', '').strip()
+            return float(cleaned)
+        logger.warning(f"Unexpected type for conversion: {type(value)}")
+        return 0.0
+    except Exception as e:
+        logger.error(f"Conversion failed for value {value} ({type(value)}): {str(e)}")
+        return 0.0
+
+
+def period_to_days(period: str) -> int:
+    """Translate high-level period to days for the date window"""
+    period = (period or "week").lower()
+    if period in ("week", "7", "7d"):
+        return 7
+    if period in ("month", "30", "30d"):
+        return 30
+    if period in ("year", "365", "365d"):
+        return 365
+    if period in ("all", "0"):
+        # very large window effectively "all"
+        return 36500
+    # default
+    return 7
+
+
+def _bucket_len(period: str) -> int:
+    """Trend bucket = prefix of the rollup day key ("YYYY-MM-DD")"""
+    if period == "year":
+        return 7
+    if period == "all":
+        return 4
+    return 10
+
+
+def _window_start(period: str) -> Optional[str]:
+    """First rollup day key inside the period window (None for "all")."""
+    if period == "all":
+        return None
+    return sales_rollup.day_key(datetime.utcnow() - timedelta(days=period_to_days(period)))
+
+
+async def build_summary(period: str) -> dict:
+    """Full dashboard summary for `period` ("week", "month", "year" or "all")."""
+    days = period_to_days(period)
+
+    # Safe aggregation helper
+    async def safe_aggregate(collection, pipeline, default, session=None):
+        try:
+            cursor = collection.aggregate(pipeline, session=session)
+            result = await cursor.to_list(length=1)
+            return result[0] if result else default
+        except Exception as e:
+            logger.error(f"Aggregation failed in {collection.name}: {str(e)}")
+            logger.debug(f"Failed pipeline: {pipeline}")
+            return default
+
+    bucket_len = _bucket_len(period)
+
+    # Daily rollups in the window (at most one doc per day)
+    start_key = _window_start(period)
+    rollup_query = {} if start_key is None else {"_id": {"$gte": start_key}}
+
+    products_pipeline = [
+        {"$facet": {
+            "status_counts": [
+                {"$group": {"_id": "$is_active", "count": {"$sum": 1}}}
+            ],
+            "inventory_value": [
+                {"$group": {"_id": None, "total": {"$sum": {"$multiply": ["$price", "$stock"]}}}}
+            ],
+            "low_stock": [
+                {"$match": {stock_alerts.FLAG: True}},
+                {"$count": "count"}
+            ]
+        }}
+    ]
+
+    # Reads go to secondaries. Summaries are rebuilt right after a write invalidates
+    # them, so both queries run in causally consistent sessions anchored on a
+    # primary read made after that write: a lagging secondary waits until it has
+    # caught up instead of putting the old figures back in the cache.
+    async with await db.client.start_session(causal_consistency=True) as rollup_session, \
+            await db.client.start_session(causal_consistency=True) as products_session:
+        await collection_versions.snapshot(["orders", "products"], session=rollup_session)
+        products_session.advance_cluster_time(rollup_session.cluster_time)
+        products_session.advance_operation_time(rollup_session.operation_time)
+
+        # Run queries in parallel (one session each: a session serves one operation at a time)
+        results = await asyncio.gather(
+            reporting_db[sales_rollup.COLLECTION].find(rollup_query, session=rollup_session).sort("_id", 1).to_list(None),
+            safe_aggregate(reporting_db["products"], products_pipeline, {"status_counts": [], "inventory_value": [{"total": Decimal128("0")}], "low_stock": []}, session=products_session),
+            return_exceptions=True
+        )
+
+    rollup_data, products_data = results
+    if isinstance(rollup_data, Exception):
+        logger.error(f"Rollup query failed: {str(rollup_data)}")
+        rollup_data = []
+
+    # Orders block + sales trend from the daily rollups
+    orders_block = {"total_orders": 0, "total_revenue": 0.0, "total_items_sold": 0}
+    trend_buckets = {}
+    for day in rollup_data:
+        revenue = _to_float(day.get("revenue"))
+        orders = int(day.get("orders", 0))
+        orders_block["total_orders"] += orders
+        orders_block["total_revenue"] += revenue
+        orders_block["total_items_sold"] += int(day.get("items_sold", 0))
+
+        bucket = trend_buckets.setdefault(day["_id"][:bucket_len], {"revenue": 0.0, "orders": 0})
+        bucket["revenue"] += revenue
+        bucket["orders"] += orders
+
+    # Products block
+    status_counts = products_data.get("status_counts", []) if not isinstance(products_data, Exception) else []
+    inventory_list = products_data.get("inventory_value", [{}]) if not isinstance(products_data, Exception) else [{}]
+    low_stock_list = products_data.get("low_stock", []) if not isinstance(products_data, Exception) else []
+
+    products_block = {
+        "total_products": sum(p.get("count", 0) for p in status_counts),
+        "active_products": next((p.get("count", 0) for p in status_counts if p.get("_id") is True), 0),
+        "inactive_products": next((p.get("count", 0) for p in status_counts if p.get("_id") is False), 0),
+        "inventory_value": _to_float(inventory_list[0].get("total") if inventory_list else 0),
+        "low_stock_count": low_stock_list[0].get("count", 0) if low_stock_list else 0
+    }
+
+    # Sales trend (rollups are sorted by day, so buckets are in order)
+    sales_trend = [
+        {"date": date, "revenue": bucket["revenue"], "orders": bucket["orders"]}
+        for date, bucket in trend_buckets.items()
+        if bucket["orders"] > 0
+    ]
+
+    response_data = {
+        "period": period,
+        "days": days,
+        "orders": orders_block,
+        "products": products_block,
+        "sales_trend": sales_trend
+    }
+
+    logger.debug("Dashboard response prepared: %s", response_data)
+    return response_data
+
+
+# -------------------
+# Live feed
+# -------------------
+class DashboardFeed:
+    """
+    One in-memory summary per subscribed period, updated from shared events.
+    Clients subscribe per period and receive "delta" messages; the summaries
+    are rebuilt every `refresh_seconds` (and sent as "snapshot") to pick up
+    changes that do not produce events, e.g. product edits or a new day.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._summaries: Dict[str, Tuple[dict, float]] = {}
+        self._clients = events.EventHub()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def snapshot(self, period: str) -> dict:
+        """Current summary for `period`, building it if needed."""
+        async with self._lock:
+            entry = self._summaries.get(period)
+            if entry is None or time.monotonic() - entry[1] > self.refresh_seconds:
+                entry = (await build_summary(period), time.monotonic())
+                self._summaries[period] = entry
+            return copy.deepcopy(entry[0])
+
+    @asynccontextmanager
+    async def subscribe(self, period: str) -> AsyncIterator[asyncio.Queue]:
+        """Yield a queue of messages for `period` until the block exits."""
+        # Subscribe first: the feed task stops as soon as it sees no subscribers
+        async with self._clients.subscribe([period]) as queue:
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._run())
+            yield queue
+
+    async def _run(self) -> None:
+        async with events.hub.subscribe([sales_rollup.EVENT_TYPE, stock_alerts.EVENT_TYPE]) as queue:
+            # A deadline rather than a wait timeout, so steady order traffic cannot postpone rebuilds
+            refresh_at = time.monotonic() + self.refresh_seconds
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=max(refresh_at - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    event = None
+                if not self._clients.subscriber_count:
+                    break
+                if event is not None:
+                    for period in list(self._summaries):
+                        delta = self._apply(period, event)
+                        if delta:
+                            self._clients.dispatch({"type": "delta", "payload": delta}, topic=period)
+                if time.monotonic() >= refresh_at:
+                    await self._refresh()
+                    refresh_at = time.monotonic() + self.refresh_seconds
+        # Nobody is watching: drop the summaries rather than keep them current
+        self._summaries.clear()
+
+    async def _refresh(self) -> None:
+        for period in list(self._summaries):
+            async with self._lock:
+                summary = await build_summary(period)
+                self._summaries[period] = (summary, time.monotonic())
+            self._clients.dispatch({"type": "snapshot", "payload": copy.deepcopy(summary)}, topic=period)
+
+    def _apply(self, period: str, event: dict) -> Optional[dict]:
+        """Apply one event to the period's summary and return the delta message (None if unaffected)."""
+        summary = self._summaries[period][0]
+        payload = event["payload"]
+
+        if event["type"] == stock_alerts.EVENT_TYPE:
+            change = 1 if payload["state"] == "low" else -1
+            summary["products"]["low_stock_count"] = max(summary["products"]["low_stock_count"] + change, 0)
+            return {
+                "low_stock_count": change,
+                "products": dict(summary["products"]),
+                "alert": payload,
+            }
+
+        start_key = _window_start(period)
+        if start_key is not None and payload["day"] < start_key:
+            return None
+        orders = summary["orders"]
+        orders["total_orders"] += payload["orders"]
+        orders["total_revenue"] += payload["revenue"]
+        orders["total_items_sold"] += payload["items_sold"]
+
+        date = payload["day"][:_bucket_len(period)]
+        trend = summary["sales_trend"]
+        bucket = next((b for b in trend if b["date"] == date), None)
+        if bucket is None:
+            bucket = {"date": date, "revenue": 0.0, "orders": 0}
+            trend.append(bucket)
+            trend.sort(key=lambda b: b["date"])
+        bucket["revenue"] += payload["revenue"]
+        bucket["orders"] += payload["orders"]
+        if bucket["orders"] <= 0:
+            trend.remove(bucket)
+        return {
+            "revenue": payload["revenue"],
+            "orders": payload["orders"],
+            "items_sold": payload["items_sold"],
+            "totals": dict(orders),
+            "bucket": dict(bucket),
+        }
+
+
+feed = DashboardFeed(refresh_seconds=settings.DASHBOARD_FEED_REFRESH_SECONDS)
@@ -0,0 +1,133 @@
+# services/events.py
+"""
+Application events shared by every worker.
+
+Writers append to the capped `events` collection:
+
+    {"_id": ObjectId, "type": str, "payload": dict, "at": datetime}
+
+Each worker tails it with one tailable cursor (`run_tail()`, started from the
+lifespan) and fans events out to its local subscribers through `hub`. A client
+connected to any worker therefore sees events raised by all of them, and
+subscribers never query Mongo themselves.
+"""
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Iterable, List, Optional, Set
+
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+from db import db
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "events"
+CAPPED_SIZE_BYTES = 16 * 1024 * 1024
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# How far back a restarted tail re-reads (duplicates are dropped by _id)
+RESUME_OVERLAP = timedelta(seconds=2)
+
+
+class Subscription:
+    def __init__(self, types: Optional[Set[str]]):
+        self.types = types
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+
+class EventHub:
+    """In-process fan-out of events to subscriber queues."""
+
+    def __init__(self):
+        self._subscriptions: Set[Subscription] = set()
+
+    @asynccontextmanager
+    async def subscribe(self, types: Optional[Iterable[str]] = None) -> AsyncIterator[asyncio.Queue]:
+        """Yield a queue receiving events of `types` (all topics when None) until the block exits."""
+        subscription = Subscription(set(types) if types else None)
+        self._subscriptions.add(subscription)
+        try:
+            yield subscription.queue
+        finally:
+            self._subscriptions.discard(subscription)
+
+    def dispatch(self, event: dict, topic: Optional[str] = None) -> None:
+        """Queue `event` for subscribers of `topic` (default: the event type)."""
+        topic = topic or event["type"]
+        for subscription in list(self._subscriptions):
+            if subscription.types is not None and topic not in subscription.types:
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A stalled client loses events rather than holding memory for everyone
+                subscription.dropped += 1
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+
+hub = EventHub()
+
+
+async def ensure_collection() -> None:
+    """Create the capped collection if it does not exist yet."""
+    try:
+        await db.create_collection(COLLECTION, capped=True, size=CAPPED_SIZE_BYTES)
+    except CollectionInvalid:
+        pass
+
+
+def event(type: str, payload: dict) -> dict:
+    return {"type": type, "payload": payload, "at": datetime.utcnow()}
+
+
+async def publish(events: List[dict]) -> None:
+    """
+    Append events for every worker. Capped collections cannot be written inside
+    a transaction, so call this after the transaction has committed.
+
+    Never fails the calling request: by then the write it reports is durable,
+    and a 500 would only invite a retry that repeats it.
+    """
+    if not events:
+        return
+    try:
+        await db[COLLECTION].insert_many(events, ordered=False)
+    except Exception as e:
+        logger.error(f"Could not publish {len(events)} event(s): {str(e)}")
+
+
+async def run_tail(retry_seconds: float = 2.0) -> None:
+    """Tail the events collection forever, dispatching to `hub`."""
+    start = ObjectId.from_datetime(datetime.utcnow())
+    seen: deque = deque(maxlen=1024)
+    seen_ids: Set[ObjectId] = set()
+    while True:
+        try:
+            cursor = db[COLLECTION].find({"_id": {"$gte": start}}, cursor_type=CursorType.TAILABLE_AWAIT)
+            while cursor.alive:
+                async for doc in cursor:
+                    if doc["_id"] in seen_ids:
+                        continue
+                    if len(seen) == seen.maxlen:
+                        seen_ids.discard(seen[0])
+                    seen.append(doc["_id"])
+                    seen_ids.add(doc["_id"])
+                    hub.dispatch({"type": doc["type"], "payload": doc.get("payload", {}), "at": doc.get("at")})
+                await asyncio.sleep(0.1)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Event tail failed, retrying in %.0fs: %s", retry_seconds, e)
+        # ObjectIds from different workers are only ordered to the second, so
+        # resume a little earlier and rely on `seen_ids` to drop repeats
+        start = ObjectId.from_datetime(datetime.utcnow() - RESUME_OVERLAP)
+        await asyncio.sleep(retry_seconds)
@@ -0,0 +1,192 @@
+# services/idempotency.py
+"""
+Idempotency-Key support for write endpoints (used by POST /orders/).
+
+Records live in the `idempotency_keys` collection, expired by a TTL index on
+`created_at` after IDEMPOTENCY_TTL_SECONDS:
+
+    {"_id": "<scope>:<key>", "fingerprint": str, "status": "pending" | "done",
+     "response": dict, "created_at": datetime}
+
+`begin()` claims a key by inserting a pending record; the unique `_id` makes
+exactly one request (on any worker) the owner. The owner writes the response
+with `Claim.complete()` inside its own transaction, so the record and the
+order commit together. Everyone else gets the stored response instead:
+
+- completed keys are answered from an in-memory TTL + LRU front cache, then
+  from the collection, without touching products;
+- duplicates arriving on the same worker while the owner is still running
+  wait on its in-flight future;
+- duplicates on other workers poll the record until it completes.
+
+A failed request releases its claim so the client can retry with the same key;
+a claim left pending by a crashed worker is taken over after STALE_PENDING.
+Reusing a key with a different request body is rejected with 422.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from pymongo.errors import DuplicateKeyError
+
+from core.config import settings
+from db import db
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "idempotency_keys"
+POLL_INTERVAL_SECONDS = 0.1
+
+# A pending record older than this belongs to a request that died (longer than
+# Mongo's default 60 s transaction lifetime), so another request may take it over
+STALE_PENDING = timedelta(seconds=90)
+
+
+def fingerprint(body: str) -> str:
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+class Claim:
+    """Outcome of `begin()`: either a stored response to replay, or ownership of the key."""
+
+    def __init__(self, store: "IdempotencyStore", record_id: str, fingerprint: str, replay: Optional[dict] = None):
+        self.store = store
+        self.record_id = record_id
+        self.fingerprint = fingerprint
+        self.replay = replay
+
+    async def complete(self, response: dict, session=None) -> None:
+        """Store the response. Pass the session to commit it with the request's own writes."""
+        await db[COLLECTION].update_one(
+            {"_id": self.record_id},
+            {"$set": {"status": "done", "response": response}},
+            session=session
+        )
+
+    def succeeded(self, response: dict) -> None:
+        """Call after the transaction committed: cache and hand the response to waiters."""
+        self.store._remember(self.record_id, self.fingerprint, response)
+        self.store._settle(self.record_id, response, None)
+
+    async def failed(self, error: BaseException) -> None:
+        """Release the key so a retry can run, and pass the error to waiters."""
+        self.store._settle(self.record_id, None, error)
+        try:
+            await db[COLLECTION].delete_one({"_id": self.record_id, "status": "pending"})
+        except Exception:
+            logger.exception("Could not release idempotency key %s", self.record_id)
+
+
+class IdempotencyStore:
+    def __init__(self, ttl_seconds: int, cache_size: int, wait_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self.wait_seconds = wait_seconds
+        self._cache: "OrderedDict[str, Tuple[float, str, dict]]" = OrderedDict()
+        self._in_flight: Dict[str, Tuple[asyncio.Future, str]] = {}  # record id -> (future, fingerprint)
+
+    async def begin(self, scope: str, key: str, body_fingerprint: str) -> Claim:
+        record_id = f"{scope}:{key}"
+
+        # 1. Completed on this worker recently
+        cached = self._cache.get(record_id)
+        if cached is not None:
+            expires_at, stored_fingerprint, response = cached
+            if expires_at > time.monotonic():
+                self._check_fingerprint(stored_fingerprint, body_fingerprint)
+                self._cache.move_to_end(record_id)
+                return Claim(self, record_id, body_fingerprint, replay=response)
+            del self._cache[record_id]
+
+        # 2. Still running on this worker
+        in_flight = self._in_flight.get(record_id)
+        if in_flight is not None:
+            future, stored_fingerprint = in_flight
+            self._check_fingerprint(stored_fingerprint, body_fingerprint)
+            try:
+                response, error = await asyncio.wait_for(asyncio.shield(future), timeout=self.wait_seconds)
+            except asyncio.TimeoutError:
+                raise self._in_progress()
+            if error is not None:
+                raise error
+            return Claim(self, record_id, body_fingerprint, replay=response)
+
+        # 3. Claim it, or find whoever did
+        now = datetime.utcnow()
+        try:
+            await db[COLLECTION].insert_one({
+                "_id": record_id,
+                "fingerprint": body_fingerprint,
+                "status": "pending",
+                "created_at": now,
+            })
+        except DuplicateKeyError:
+            return await self._wait_for_record(scope, key, body_fingerprint)
+
+        return self._own(record_id, body_fingerprint)
+
+    async def _wait_for_record(self, scope: str, key: str, body_fingerprint: str) -> Claim:
+        """Another worker owns the key: poll until it stores a response."""
+        record_id = f"{scope}:{key}"
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            record = await db[COLLECTION].find_one({"_id": record_id})
+            if record is None:
+                # The owner failed and released the key; claim it afresh
+                return await self.begin(scope, key, body_fingerprint)
+            self._check_fingerprint(record["fingerprint"], body_fingerprint)
+            if record["status"] == "done":
+                self._remember(record_id, record["fingerprint"], record["response"])
+                return Claim(self, record_id, body_fingerprint, replay=record["response"])
+            if record["created_at"] < datetime.utcnow() - STALE_PENDING:
+                taken = await db[COLLECTION].update_one(
+                    {"_id": record_id, "status": "pending", "created_at": record["created_at"]},
+                    {"$set": {"created_at": datetime.utcnow()}}
+                )
+                if taken.modified_count:
+                    return self._own(record_id, body_fingerprint)
+            if time.monotonic() >= deadline:
+                raise self._in_progress()
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+    def _own(self, record_id: str, body_fingerprint: str) -> Claim:
+        self._in_flight[record_id] = (asyncio.get_running_loop().create_future(), body_fingerprint)
+        return Claim(self, record_id, body_fingerprint)
+
+    def _remember(self, record_id: str, body_fingerprint: str, response: dict) -> None:
+        self._cache[record_id] = (time.monotonic() + self.ttl_seconds, body_fingerprint, response)
+        self._cache.move_to_end(record_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _settle(self, record_id: str, response: Optional[dict], error: Optional[BaseException]) -> None:
+        in_flight = self._in_flight.pop(record_id, None)
+        if in_flight is not None and not in_flight[0].done():
+            in_flight[0].set_result((response, error))
+
+    @staticmethod
+    def _check_fingerprint(stored: str, received: str) -> None:
+        if stored != received:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used with a different request body"
+            )
+
+    @staticmethod
+    def _in_progress() -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still in progress"
+        )
+
+
+idempotency_store = IdempotencyStore(
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    cache_size=settings.IDEMPOTENCY_CACHE_SIZE,
+    wait_seconds=settings.IDEMPOTENCY_WAIT_SECONDS,
+)
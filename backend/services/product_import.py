@@ -0,0 +1,271 @@
+# services/product_import.py
+"""
+Streaming bulk product import from CSV or NDJSON.
+
+Rows are read one at a time from the uploaded file, validated against
+`ProductCreate` and written in chunks with unordered `bulk_write` upserts keyed
+on (category_id, name) case-insensitively - the same key as the unique index.
+Only one chunk is held in memory, and the error report is capped. A chunk never
+holds the same product twice; a repeated row starts the next chunk. Stock
+changes are appended to the stock ledger as differences from the prior level,
+and products crossing their reorder level raise stock alerts. Each chunk is
+written in one transaction (a replica set is required, as for orders).
+
+Columns / keys: name, description, price, stock, reorder_level, is_active, and
+either category_id or category (category name).
+"""
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from core.indexes import CASE_INSENSITIVE
+from db import db, run_transaction, TransactionConflict
+from models.product import ProductCreate
+from services import product_search, stock_alerts, stock_ledger
+from services.category_index import category_index
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+# -------------------
+# Readers
+# -------------------
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    name = (filename or "").lower()
+    if name.endswith(".csv") or content_type == "text/csv":
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or content_type in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    return None
+
+
+def iter_rows(fileobj, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (row_number, row) pairs; row is a dict, or an error string for unparsable lines."""
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        for number, row in enumerate(csv.DictReader(text), start=2):  # row 1 is the header
+            yield number, row
+        return
+
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, f"Invalid JSON: {e}"
+            continue
+        yield number, row if isinstance(row, dict) else "Expected a JSON object"
+
+
+# -------------------
+# Import
+# -------------------
+class ImportReport:
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def add_error(self, row: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "processed": self.processed,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def _clean(row: Dict[str, Any]) -> Dict[str, Any]:
+    """CSV gives empty strings for missing values; treat them as absent."""
+    return {k.strip(): v for k, v in row.items() if k and v not in ("", None)}
+
+
+class PendingRow:
+    """A validated row waiting for the next bulk_write."""
+
+    def __init__(self, number: int, product: ProductCreate, operation: UpdateOne, new_id: str):
+        self.number = number
+        self.product = product
+        self.operation = operation
+        self.new_id = new_id
+
+    @property
+    def key(self) -> Tuple[Optional[str], str]:
+        return self.product.category_id, self.product.name.lower()
+
+
+def _to_pending(number: int, row: Dict[str, Any], categories: Dict[str, str], now: datetime) -> PendingRow:
+    row = _clean(row)
+    category_ref = row.pop("category", None)
+    if category_ref is not None and "category_id" not in row:
+        category_id = categories.get(str(category_ref).strip().lower())
+        if not category_id:
+            raise ValueError(f"Unknown category {category_ref!r}")
+        row["category_id"] = category_id
+    elif "category_id" in row and row["category_id"] not in categories:
+        raise ValueError(f"Unknown category_id {row['category_id']!r}")
+
+    product = ProductCreate(**row)
+    fields = product.dict()
+    fields.update(product_search.build_search_fields(product.name, product.description))
+    fields["updated_at"] = now
+    if fields.get("reorder_level") is None:
+        del fields["reorder_level"]  # keep an existing product's threshold
+    new_id = str(uuid.uuid4())
+    operation = UpdateOne(
+        {"category_id": product.category_id, "name": product.name},
+        {"$set": fields, "$setOnInsert": {"id": new_id, "created_at": now}},
+        upsert=True,
+        collation=CASE_INSENSITIVE,
+    )
+    return PendingRow(number, product, operation, new_id)
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+async def _existing_stock(pending: List[PendingRow], session=None) -> Dict[Tuple[Optional[str], str], dict]:
+    """Current id, stock and reorder level of the products this chunk will upsert, in one query."""
+    query = {"$or": [{"category_id": p.product.category_id, "name": p.product.name} for p in pending]}
+    existing = {}
+    projection = {"id": 1, "name": 1, "category_id": 1, "stock": 1, "reorder_level": 1}
+    async for doc in db["products"].find(query, projection, collation=CASE_INSENSITIVE, session=session):
+        existing[(doc.get("category_id"), doc["name"].lower())] = doc
+    return existing
+
+
+async def _write_chunk(pending: List[PendingRow], user: dict, session) -> Tuple[List[Optional[dict]], dict]:
+    """Upsert the chunk and record its ledger movements. Returns (alerts, bulk write result)."""
+    existing = await _existing_stock(pending, session)
+    result = await db["products"].bulk_write([p.operation for p in pending], ordered=False, session=session)
+
+    movements = []
+    alerts = []
+    written_ids = []
+    for p in pending:
+        before = existing.get(p.key)
+        product_id = before["id"] if before else p.new_id
+        written_ids.append(product_id)
+        previous_stock = int(before.get("stock", 0)) if before else 0
+        movements.append(stock_ledger.movement(product_id, p.product.stock - previous_stock, "Bulk import", user))
+        if before:
+            alerts.append(stock_alerts.crossing(before, previous_stock, p.product.stock, p.product.reorder_level))
+        else:
+            alerts.append(stock_alerts.created({**p.product.dict(), "id": product_id}))
+    await stock_ledger.record(movements, session=session)
+
+    # Upserts cannot use pipeline updates alongside $setOnInsert, so the low-stock
+    # flag is recomputed for the chunk in one extra write
+    await db["products"].update_many({"id": {"$in": written_ids}}, [stock_alerts.FLAG_STAGE], session=session)
+    return alerts, result.bulk_api_result
+
+
+async def _flush(pending: List[PendingRow], report: ImportReport, user: dict) -> None:
+    """
+    Write one chunk in a transaction, so the stock read the ledger differences
+    are computed from and the upserts see the same data: an order committing in
+    between makes the transaction retry instead of skewing the movements.
+
+    Inside a transaction a failing row (e.g. a duplicate key) aborts the whole
+    bulk write, so it is reported and the chunk retried without it.
+    """
+    while pending:
+        chunk = pending
+        try:
+            alerts, details = await run_transaction(lambda session: _write_chunk(chunk, user, session))
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if not errors:
+                raise
+            index = errors[0]["index"]
+            report.add_error(pending[index].number, errors[0].get("errmsg", "Write failed"))
+            pending = pending[:index] + pending[index + 1:]
+            continue
+        except TransactionConflict:
+            # Upserts set absolute values, so importing these rows again is safe
+            for p in pending:
+                report.add_error(p.number, "Conflicting concurrent write, import this row again")
+            return
+        report.inserted += details.get("nUpserted", 0)
+        report.updated += details.get("nModified", 0)
+        await stock_alerts.raise_alerts(alerts)
+        return
+
+
+def _next_chunk(
+    rows: Iterator[Tuple[int, Any]],
+    report: ImportReport,
+    categories: Dict[str, str],
+    now: datetime,
+    chunk_size: int,
+    carry: Optional[PendingRow],
+) -> Tuple[List[PendingRow], Optional[PendingRow], bool]:
+    """
+    Runs in a worker thread: read, parse and validate rows until `chunk_size` are
+    pending, a row repeats a pending product, or the input ends.
+
+    A repeated product is returned as `carry` to start the next chunk: within one
+    chunk every row is diffed against the same pre-read, so repeats must apply in
+    file order. Returns (pending, carry, done).
+    """
+    pending = [carry] if carry else []
+    keys = {carry.key} if carry else set()
+    for number, row in rows:
+        report.processed += 1
+        if isinstance(row, str):
+            report.add_error(number, row)
+            continue
+        try:
+            item = _to_pending(number, row, categories, now)
+        except ValidationError as e:
+            report.add_error(number, _format_validation_error(e))
+            continue
+        except (ValueError, TypeError) as e:
+            report.add_error(number, str(e))
+            continue
+
+        if item.key in keys:
+            return pending, item, False
+        pending.append(item)
+        keys.add(item.key)
+        if len(pending) >= chunk_size:
+            return pending, None, False
+    return pending, None, True
+
+
+async def import_products(fileobj, fmt: str, user: dict, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, Any]:
+    """Validate and upsert every row of `fileobj` on behalf of `user`. Returns the import report."""
+    categories = await category_index.name_map()
+    report = ImportReport()
+    now = datetime.utcnow()
+
+    # Reading, CSV/JSON parsing and validation are CPU-bound and run in a thread,
+    # one chunk at a time, so even a file of nothing but invalid rows never
+    # holds up the other requests on this worker
+    rows = iter_rows(fileobj, fmt)
+    carry = None
+    done = False
+    while not done:
+        pending, carry, done = await run_in_threadpool(_next_chunk, rows, report, categories, now, chunk_size, carry)
+        await _flush(pending, report, user)
+    return report.as_dict()
@@ -0,0 +1,167 @@
+# services/product_search.py
+"""
+Prefix search over product names and descriptions.
+
+Each product stores two maintained token arrays:
+    name_terms   - every prefix of every word in the name ("cola" -> c, co, col, cola)
+    search_terms - name_terms plus the whole words of the description
+
+`search_terms` has a multikey index, so a query like "coca co" becomes
+{"search_terms": {"$all": ["coca", "co"]}} and is answered from the index;
+the last word typed matches as a prefix. Results are ranked by how many query
+words hit the name, with a bonus when the name starts with the query.
+
+Products written before the terms existed get them from `backfill()`, which
+the app runs in the background at startup; `python -m services.product_search`
+rebuilds the terms of every product.
+"""
+import asyncio
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from db import db
+from services import collection_versions
+
+logger = logging.getLogger(__name__)
+
+MAX_PREFIX_LENGTH = 20
+# Upper bound on documents ranked/faceted per search
+MAX_CANDIDATES = 5000
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# -------------------
+# Tokenizing
+# -------------------
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercased words, in order, without duplicates."""
+    if not text:
+        return []
+    return list(dict.fromkeys(w[:MAX_PREFIX_LENGTH] for w in _WORD_RE.findall(text.lower())))
+
+
+def _prefixes(word: str) -> List[str]:
+    return [word[:i] for i in range(1, len(word) + 1)]
+
+
+def build_search_fields(name: str, description: Optional[str]) -> Dict[str, List[str]]:
+    """Token arrays to $set on a product whenever its name or description changes."""
+    name_terms = list(dict.fromkeys(p for word in tokenize(name) for p in _prefixes(word)))
+    search_terms = list(dict.fromkeys(name_terms + tokenize(description)))
+    return {"name_terms": name_terms, "search_terms": search_terms}
+
+
+# -------------------
+# Querying
+# -------------------
+def search_filter(search: str) -> Dict[str, Any]:
+    """Index-backed filter for `search`. Empty input matches nothing."""
+    tokens = tokenize(search)
+    if not tokens:
+        return {"search_terms": {"$in": []}}
+    return {"search_terms": {"$all": tokens}}
+
+
+async def search_products(
+    search: str,
+    base_query: Dict[str, Any],
+    skip: int = 0,
+    limit: int = 25,
+) -> Dict[str, Any]:
+    """
+    Ranked search with category facets.
+
+    Returns {"results": [...], "total": int, "facets": {"categories": [{"category_id", "count"}]}}.
+    Facets and total ignore skip/limit but are capped at MAX_CANDIDATES.
+    """
+    tokens = tokenize(search)
+    query = {**base_query, **search_filter(search)}
+    phrase = " ".join(tokens)
+
+    pipeline = [
+        {"$match": query},
+        {"$limit": MAX_CANDIDATES},
+        {"$facet": {
+            "results": [
+                {"$addFields": {"_score": {"$add": [
+                    {"$multiply": [2, {"$size": {"$setIntersection": ["$name_terms", tokens]}}]},
+                    {"$cond": [
+                        {"$eq": [{"$indexOfCP": [{"$toLower": "$name"}, phrase]}, 0]}, 5, 0
+                    ]},
+                ]}}},
+                {"$sort": {"_score": -1, "name": 1, "id": 1}},
+                {"$skip": skip},
+                {"$limit": limit},
+                {"$project": {"_score": 0, "name_terms": 0, "search_terms": 0}},
+            ],
+            "categories": [
+                {"$group": {"_id": "$category_id", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}},
+            ],
+            "total": [{"$count": "count"}],
+        }},
+    ]
+    data = (await db["products"].aggregate(pipeline).to_list(length=1))[0]
+
+    return {
+        "results": data["results"],
+        "total": data["total"][0]["count"] if data["total"] else 0,
+        "facets": {
+            "categories": [
+                {"category_id": c["_id"], "count": c["count"]} for c in data["categories"]
+            ],
+        },
+    }
+
+
+# -------------------
+# Backfill
+# -------------------
+# Products without the token arrays (missing or null), found through the search_terms index
+MISSING_TERMS = {"search_terms": None}
+
+
+async def rebuild(batch_size: int = 1000, query: Optional[Dict[str, Any]] = None) -> int:
+    """Recompute the token arrays for every product matching `query` (default all). Returns the number updated."""
+    updated = 0
+    ops = []
+    cursor = db["products"].find(query or {}, {"id": 1, "name": 1, "description": 1}).batch_size(batch_size)
+    async for product in cursor:
+        fields = build_search_fields(product.get("name", ""), product.get("description"))
+        ops.append(UpdateOne({"_id": product["_id"]}, {"$set": fields}))
+        if len(ops) >= batch_size:
+            await db["products"].bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+    if ops:
+        await db["products"].bulk_write(ops, ordered=False)
+        updated += len(ops)
+    return updated
+
+
+async def backfill() -> int:
+    """
+    Build the token arrays of products that have none (e.g. created before
+    search existed). Logs instead of raising: it runs as a background task.
+    """
+    try:
+        if not await db["products"].find_one(MISSING_TERMS, {"_id": 1}):
+            return 0
+        count = await rebuild(query=MISSING_TERMS)
+    except Exception as e:
+        logger.error(f"Search terms backfill failed: {str(e)}")
+        return 0
+    logger.info("Built search terms for %d products", count)
+    # Search results changed, so conditional GETs of the product list must not answer 304
+    await collection_versions.changed("products")
+    return count
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    count = asyncio.run(rebuild())
+    logger.info("Rebuilt search terms for %d products", count)
@@ -0,0 +1,152 @@
+# services/report_cache.py
+"""
+Rendered report PDFs cached on local disk, shared by every worker on the host.
+
+Entries are addressed by `key()`: a hash of the report kind, its query
+parameters, the data versions (collection_versions counters) of the
+collections it reads and the report templates' revision. Writes bump those
+versions, so a report whose data changed gets a new key and the old file just
+ages out - nothing is invalidated in place.
+
+Files are named `<key>.<etag>.pdf`, the ETag being a hash of the PDF bytes
+(a strong validator). Reads refresh a file's mtime and `put()` evicts the
+least recently used files while the directory is over REPORT_CACHE_MAX_BYTES
+(0 disables the cache). Concurrent requests for the same key on one worker
+share a single render.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates" / "reports"
+
+
+class CachedReport(NamedTuple):
+    path: Path
+    etag: str  # quoted, ready for the ETag header
+
+
+def _templates_revision() -> str:
+    """Changes whenever a report template or stylesheet is edited or redeployed."""
+    parts = []
+    for path in sorted(TEMPLATE_DIR.iterdir()):
+        if path.is_file():
+            stat = path.stat()
+            parts.append(f"{path.name}:{stat.st_mtime_ns}:{stat.st_size}")
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:16]
+
+
+class ReportCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._revision: Optional[str] = None
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def key(self, kind: str, params: dict, versions: Dict[str, int]) -> str:
+        if self._revision is None:
+            self._revision = _templates_revision()
+        raw = json.dumps(
+            {"kind": kind, "params": params, "versions": versions, "templates": self._revision},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    async def lookup(self, key: str) -> Optional[CachedReport]:
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self._lookup, key)
+
+    async def read(self, report: CachedReport) -> Optional[bytes]:
+        """The cached bytes, or None if another worker evicted the file meanwhile."""
+        try:
+            return await asyncio.to_thread(report.path.read_bytes)
+        except FileNotFoundError:
+            return None
+
+    async def render_once(self, key: str, render: Callable[[], Awaitable[bytes]]) -> Tuple[bytes, str]:
+        """Render and store the report, sharing one render among concurrent callers for `key`."""
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            content, etag, error = await asyncio.shield(in_flight)
+            if error is not None:
+                raise error
+            return content, etag
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            content = await render()
+            etag = await self.put(key, content)
+        except BaseException as e:
+            future.set_result((None, None, e))
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+        future.set_result((content, etag, None))
+        return content, etag
+
+    async def put(self, key: str, content: bytes) -> str:
+        """Store the PDF and return its ETag. A failed write only costs the cache entry."""
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        if self.enabled:
+            try:
+                await asyncio.to_thread(self._store, key, digest, content)
+            except OSError as e:
+                logger.error(f"Could not cache report {key}: {str(e)}")
+        return f'"{digest}"'
+
+    def _lookup(self, key: str) -> Optional[CachedReport]:
+        for path in self.directory.glob(f"{key}.*.pdf"):
+            try:
+                os.utime(path)  # most recently used
+            except FileNotFoundError:
+                continue
+            return CachedReport(path, f'"{path.name.split(".")[1]}"')
+        return None
+
+    def _store(self, key: str, digest: str, content: bytes) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{key}.{digest}.pdf"
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(content)
+        os.replace(tmp, path)
+        # Another worker may have rendered the same key (different timestamp, different bytes)
+        for other in self.directory.glob(f"{key}.*.pdf"):
+            if other != path:
+                other.unlink(missing_ok=True)
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        for path in self.directory.glob("*.pdf"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+report_cache = ReportCache(settings.REPORT_CACHE_DIR, settings.REPORT_CACHE_MAX_BYTES)
@@ -0,0 +1,79 @@
+# services/sales_rollup.py
+"""
+Daily sales rollups (`sales_daily` collection).
+
+One document per UTC day:
+    {"_id": "YYYY-MM-DD", "revenue": float, "orders": int, "items_sold": int}
+
+`items_sold` counts order lines, matching the dashboard's historical
+"total_items_sold" figure. Cancelled orders are not counted.
+
+Orders update the rollup incrementally via `record_order()` and publish the
+same change as a "sales_delta" event (`order_event()`) for live dashboards;
+run `python -m services.sales_rollup` to rebuild it from the orders collection.
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+from db import db
+from services import events
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "sales_daily"
+EVENT_TYPE = "sales_delta"
+
+
+def day_key(value: datetime) -> str:
+    """Rollup key for a timestamp."""
+    return value.strftime("%Y-%m-%d")
+
+
+async def record_order(order: dict, sign: int = 1, session=None) -> None:
+    """
+    Add (sign=1) or remove (sign=-1) an order's contribution to its day.
+    Pass the session when called inside a transaction.
+    """
+    await db[COLLECTION].update_one(
+        {"_id": day_key(order["created_at"])},
+        {"$inc": {
+            "revenue": sign * float(order.get("total", 0)),
+            "orders": sign,
+            "items_sold": sign * len(order.get("items") or []),
+        }},
+        upsert=True,
+        session=session
+    )
+
+
+def order_event(order: dict, sign: int = 1) -> dict:
+    """The change `record_order()` makes, as an event for services/events.py."""
+    return events.event(EVENT_TYPE, {
+        "day": day_key(order["created_at"]),
+        "revenue": sign * float(order.get("total", 0)),
+        "orders": sign,
+        "items_sold": sign * len(order.get("items") or []),
+    })
+
+
+async def rebuild() -> int:
+    """Recompute every rollup from the orders collection. Returns the number of days."""
+    pipeline = [
+        {"$match": {"status": {"$ne": "cancelled"}}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+            "revenue": {"$sum": "$total"},
+            "orders": {"$sum": 1},
+            "items_sold": {"$sum": {"$size": "$items"}}
+        }},
+        {"$out": COLLECTION}
+    ]
+    await db["orders"].aggregate(pipeline).to_list(length=None)
+    return await db[COLLECTION].count_documents({})
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    days = asyncio.run(rebuild())
+    logger.info("Rebuilt %s with %d daily rollups", COLLECTION, days)
@@ -0,0 +1,130 @@
+# services/stock_alerts.py
+"""
+Per-product reorder thresholds and low-stock alerts.
+
+Every product carries a `reorder_level` (DEFAULT_REORDER_LEVEL when absent) and
+a maintained `below_reorder` flag (stock <= reorder_level). The flag has a
+partial index holding only the flagged products, so "what should I reorder"
+reads that small index instead of scanning the catalogue.
+
+Writers that change stock or the level set the flag in the same update
+(`FLAG_STAGE` for pipeline updates, `is_below()` otherwise) and call
+`crossing()` with the before/after values (`created()` for new products,
+which count as crossing when stored at or below their level); crossings are
+published as "stock_alert" events (services/events.py) for clients to
+subscribe to.
+
+Products without their own level are flagged against DEFAULT_REORDER_LEVEL,
+so the stored flags depend on that setting: `sync_default_level()` (run at
+startup) recomputes them whenever it differs from the value they were last
+computed with, which is kept in the `app_state` collection.
+
+    cd backend
+    python -m services.stock_alerts     # backfill the flag for existing products
+"""
+import asyncio
+import logging
+from typing import List, Optional
+
+from core.config import settings
+from db import db
+from services import events
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPE = "stock_alert"
+FLAG = "below_reorder"
+STATE_COLLECTION = "app_state"
+DEFAULT_LEVEL_STATE = "stock_alerts.default_reorder_level"
+
+# Pipeline-update stage recomputing the flag from the document's new values
+FLAG_STAGE = {"$set": {FLAG: {"$lte": ["$stock", {"$ifNull": ["$reorder_level", settings.DEFAULT_REORDER_LEVEL]}]}}}
+
+
+def reorder_level(product: dict) -> int:
+    level = product.get("reorder_level")
+    return settings.DEFAULT_REORDER_LEVEL if level is None else int(level)
+
+
+def is_below(stock: int, level: int) -> bool:
+    return stock <= level
+
+
+def crossing(product: dict, stock_before: int, stock_after: int, level_after: Optional[int] = None) -> Optional[dict]:
+    """
+    Alert event if this change moved the product across its threshold, else None.
+    `product` supplies id, name and the previous reorder_level.
+    """
+    level_before = reorder_level(product)
+    level_after = level_before if level_after is None else level_after
+    was_below = is_below(stock_before, level_before)
+    now_below = is_below(stock_after, level_after)
+    if was_below == now_below:
+        return None
+    return _alert(product, stock_after, level_after, now_below)
+
+
+def created(product: dict) -> Optional[dict]:
+    """Alert event for a new product stored at or below its threshold, else None."""
+    level = reorder_level(product)
+    if not is_below(product["stock"], level):
+        return None
+    return _alert(product, product["stock"], level, True)
+
+
+def _alert(product: dict, stock: int, level: int, below: bool) -> dict:
+    return events.event(EVENT_TYPE, {
+        "product_id": product["id"],
+        "product_name": product.get("name"),
+        "stock": stock,
+        "reorder_level": level,
+        "state": "low" if below else "restocked",
+    })
+
+
+async def raise_alerts(alerts: List[Optional[dict]]) -> None:
+    """
+    Publish the non-empty results of `crossing()`. Call after the write has
+    committed; like `events.publish()` it never fails the calling request.
+    """
+    await events.publish([a for a in alerts if a])
+
+
+async def below_threshold(limit: int = 100) -> List[dict]:
+    """Products at or below their reorder level, lowest stock first (partial index)."""
+    projection = {"_id": 0, "id": 1, "name": 1, "stock": 1, "reorder_level": 1, "category_id": 1, "is_active": 1}
+    products = await db["products"].find({FLAG: True}, projection).sort("stock", 1).to_list(limit)
+    for p in products:
+        p["reorder_level"] = reorder_level(p)
+    return products
+
+
+async def sync_default_level() -> bool:
+    """
+    Recompute the flag of products using the default level if DEFAULT_REORDER_LEVEL
+    changed since the flags were computed. Returns True if it did.
+    """
+    level = settings.DEFAULT_REORDER_LEVEL
+    state = await db[STATE_COLLECTION].find_one({"_id": DEFAULT_LEVEL_STATE})
+    if state is not None and state.get("value") == level:
+        return False
+    # Only products without their own level (missing or null) depend on the default
+    await db["products"].update_many({"reorder_level": None}, [FLAG_STAGE])
+    await db[STATE_COLLECTION].update_one({"_id": DEFAULT_LEVEL_STATE}, {"$set": {"value": level}}, upsert=True)
+    logger.info("Recomputed low-stock flags for default reorder level %d", level)
+    return True
+
+
+async def rebuild() -> int:
+    """Recompute the flag on every product. Returns the number flagged."""
+    await db["products"].update_many({}, [FLAG_STAGE])
+    await db[STATE_COLLECTION].update_one(
+        {"_id": DEFAULT_LEVEL_STATE}, {"$set": {"value": settings.DEFAULT_REORDER_LEVEL}}, upsert=True
+    )
+    return await db["products"].count_documents({FLAG: True})
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    flagged = asyncio.run(rebuild())
+    logger.info("%d products are at or below their reorder level", flagged)
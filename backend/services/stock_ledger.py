@@ -0,0 +1,227 @@
+# services/stock_ledger.py
+"""
+Append-only stock movement ledger with periodic snapshot checkpoints.
+
+Collections:
+    stock_movements   - one `StockOperation` per stock change (never updated)
+    stock_snapshots   - {product_id, timestamp, stock} written by checkpoints
+    stock_checkpoints - {timestamp} of every checkpoint, in order
+
+A checkpoint at time C folds the movements since the previous checkpoint into
+a new snapshot for each product that moved, so the stock of any product at
+time T is: latest snapshot <= T + movements after that snapshot up to T.
+Queries therefore only read the movements since the last checkpoint. A
+product that moved but has no snapshot yet is seeded from its current stock,
+never from zero, and the first checkpoint takes the baseline if it is missing.
+
+    python -m services.stock_ledger baseline     # snapshot current stock (once, when enabling the ledger)
+    python -m services.stock_ledger checkpoint   # fold recent movements into snapshots
+"""
+import asyncio
+import logging
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import DESCENDING
+
+from db import db
+from models.stock import StockOperation
+
+logger = logging.getLogger(__name__)
+
+MOVEMENTS = "stock_movements"
+SNAPSHOTS = "stock_snapshots"
+CHECKPOINTS = "stock_checkpoints"
+
+# Checkpoints stop this far in the past so movements from transactions that are
+# still committing (timestamped earlier than their commit) are not skipped.
+CHECKPOINT_GRACE = timedelta(seconds=60)
+
+
+# -------------------
+# Writing movements
+# -------------------
+def movement(product_id: str, delta: int, reason: str, user: dict, timestamp: Optional[datetime] = None) -> Optional[dict]:
+    """Build a ledger entry for a signed stock change. Returns None when delta is 0."""
+    if not delta:
+        return None
+    operation = StockOperation(
+        product_id=product_id,
+        type="increase" if delta > 0 else "decrease",
+        quantity=abs(delta),
+        reason=reason,
+        timestamp=timestamp or datetime.utcnow(),
+        performed_by_id=str(user["id"]),
+        performed_by_username=user["username"],
+    )
+    return operation.dict()
+
+
+async def record(movements: List[Optional[dict]], session=None) -> None:
+    """Append a batch of movements (None entries are skipped)."""
+    docs = [m for m in movements if m]
+    if docs:
+        await db[MOVEMENTS].insert_many(docs, ordered=False, session=session)
+
+
+def _signed_quantity() -> dict:
+    return {"$cond": [{"$eq": ["$type", "increase"]}, "$quantity", {"$multiply": [-1, "$quantity"]}]}
+
+
+async def _movement_totals(match: dict) -> Dict[str, int]:
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": "$product_id", "delta": {"$sum": _signed_quantity()}}},
+    ]
+    return {d["_id"]: d["delta"] async for d in db[MOVEMENTS].aggregate(pipeline)}
+
+
+# -------------------
+# Checkpoints
+# -------------------
+async def last_checkpoint(before: Optional[datetime] = None) -> Optional[datetime]:
+    query = {"timestamp": {"$lte": before}} if before else {}
+    doc = await db[CHECKPOINTS].find_one(query, sort=[("timestamp", DESCENDING)])
+    return doc["timestamp"] if doc else None
+
+
+async def _latest_snapshots(at: datetime, product_id: Optional[str] = None) -> Dict[str, dict]:
+    match: Dict[str, Any] = {"timestamp": {"$lte": at}}
+    if product_id:
+        match["product_id"] = product_id
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"product_id": 1, "timestamp": -1}},
+        {"$group": {"_id": "$product_id", "stock": {"$first": "$stock"}, "timestamp": {"$first": "$timestamp"}}},
+    ]
+    return {d["_id"]: d async for d in db[SNAPSHOTS].aggregate(pipeline)}
+
+
+async def baseline() -> int:
+    """Snapshot every product's current stock as the ledger's starting point."""
+    now = datetime.utcnow()
+    docs = [
+        {"product_id": p["id"], "timestamp": now, "stock": int(p.get("stock", 0))}
+        async for p in db["products"].find({}, {"id": 1, "stock": 1})
+    ]
+    if docs:
+        await db[SNAPSHOTS].insert_many(docs)
+    await db[CHECKPOINTS].insert_one({"timestamp": now})
+    return len(docs)
+
+
+async def _stock_from_products(product_ids: List[str], at: datetime) -> Dict[str, int]:
+    """Stock at `at` from the products' current stock minus the movements recorded after `at`."""
+    current = {
+        p["id"]: int(p.get("stock", 0))
+        async for p in db["products"].find({"id": {"$in": product_ids}}, {"id": 1, "stock": 1})
+    }
+    later = await _movement_totals({"product_id": {"$in": list(current)}, "timestamp": {"$gt": at}})
+    return {pid: stock - later.get(pid, 0) for pid, stock in current.items()}
+
+
+async def checkpoint() -> int:
+    """
+    Write snapshots for every product that moved since the last checkpoint.
+    Without any checkpoint yet this takes the baseline instead, since the
+    movements alone do not know the stock products had before the ledger.
+    """
+    until = datetime.utcnow() - CHECKPOINT_GRACE
+    since = await last_checkpoint()
+    if since is None:
+        logger.warning("No stock baseline yet, snapshotting current stock instead of checkpointing")
+        return await baseline()
+    if since >= until:
+        return 0
+
+    deltas = await _movement_totals({"timestamp": {"$gt": since, "$lte": until}})
+
+    previous = await _latest_snapshots(since) if deltas else {}
+    # Products without a snapshot are seeded from their current stock; only
+    # products deleted meanwhile fall back to their movements (created after the baseline)
+    missing = [product_id for product_id in deltas if product_id not in previous]
+    seeded = await _stock_from_products(missing, until) if missing else {}
+    docs = [
+        {
+            "product_id": product_id,
+            "timestamp": until,
+            "stock": seeded[product_id] if product_id in seeded else previous.get(product_id, {}).get("stock", 0) + delta,
+        }
+        for product_id, delta in deltas.items()
+    ]
+    if docs:
+        await db[SNAPSHOTS].insert_many(docs)
+    await db[CHECKPOINTS].insert_one({"timestamp": until})
+    return len(docs)
+
+
+async def run_checkpoints(interval_seconds: int) -> None:
+    """
+    Background loop started from the app lifespan. Every API worker runs one;
+    the jittered sleep and the recent-checkpoint check leave the work to
+    whichever worker wakes first.
+    """
+    while True:
+        await asyncio.sleep(interval_seconds * random.uniform(1.0, 1.1))
+        try:
+            latest = await last_checkpoint()
+            if latest and latest > datetime.utcnow() - CHECKPOINT_GRACE - timedelta(seconds=interval_seconds / 2):
+                continue
+            written = await checkpoint()
+            logger.info("Stock checkpoint wrote %d snapshots", written)
+        except Exception as e:
+            logger.error(f"Stock checkpoint failed: {str(e)}")
+
+
+# -------------------
+# Queries
+# -------------------
+async def stock_at(at: datetime, product_id: Optional[str] = None) -> Dict[str, int]:
+    """Stock per product at time `at` (one product when product_id is given)."""
+    since = await last_checkpoint(before=at)
+    snapshots = await _latest_snapshots(since, product_id) if since else {}
+
+    match: Dict[str, Any] = {"timestamp": {"$lte": at}}
+    if since:
+        match["timestamp"]["$gt"] = since
+    if product_id:
+        match["product_id"] = product_id
+    deltas = await _movement_totals(match)
+
+    stock = {pid: snap["stock"] for pid, snap in snapshots.items()}
+    for pid, delta in deltas.items():
+        stock[pid] = stock.get(pid, 0) + delta
+    return stock
+
+
+async def history(
+    product_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 100,
+) -> List[dict]:
+    """Movements, newest first."""
+    query: Dict[str, Any] = {}
+    if product_id:
+        query["product_id"] = product_id
+    if start or end:
+        query["timestamp"] = {}
+        if start:
+            query["timestamp"]["$gte"] = start
+        if end:
+            query["timestamp"]["$lte"] = end
+    cursor = db[MOVEMENTS].find(query, {"_id": 0}).sort("timestamp", DESCENDING).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else "checkpoint"
+    if command == "baseline":
+        logger.info("Baseline snapshots: %d", asyncio.run(baseline()))
+    elif command == "checkpoint":
+        logger.info("Checkpoint snapshots: %d", asyncio.run(checkpoint()))
+    else:
+        sys.exit(f"Unknown command {command!r} (use baseline or checkpoint)")
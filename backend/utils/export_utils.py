@@ -0,0 +1,88 @@
+# utils/export_utils.py
+"""
+Constant-memory CSV / NDJSON export of a Motor cursor.
+
+Rows are pulled from the cursor in batches and yielded in ~64 KB pieces
+(optionally gzip-compressed on the fly), so nothing is truncated and memory
+does not grow with the number of rows.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from bson.decimal128 import Decimal128
+
+FLUSH_BYTES = 64 * 1024
+CURSOR_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    return str(value)
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    return "" if value is None else value
+
+
+async def stream_export(
+    cursor,
+    columns: List[str],
+    fmt: str,
+    gzip: bool = False,
+    transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+) -> AsyncIterator[bytes]:
+    """Yield the encoded export of every document in `cursor` (optionally reshaped by `transform`)."""
+    compressor = zlib.compressobj(wbits=31) if gzip else None  # wbits=31 -> gzip container
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(columns)
+
+    def drain() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    async for doc in cursor.batch_size(CURSOR_BATCH_SIZE):
+        row = transform(doc) if transform else doc
+        if writer:
+            writer.writerow([_csv_value(row.get(c)) for c in columns])
+        else:
+            buffer.write(json.dumps({c: row.get(c) for c in columns}, default=_json_default))
+            buffer.write("\n")
+        if buffer.tell() >= FLUSH_BYTES:
+            chunk = drain()
+            if chunk:
+                yield chunk
+
+    chunk = drain()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def export_filename(kind: str, fmt: str, gzip: bool) -> str:
+    name = f"{kind}_export_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    return name + ".gz" if gzip else name
+
+
+def export_media_type(fmt: str, gzip: bool) -> str:
+    return "application/gzip" if gzip else MEDIA_TYPES[fmt]
@@ -0,0 +1,73 @@
+# utils/http_cache.py
+"""
+Conditional GET helpers: validators (ETag / Last-Modified), matching and 304 responses.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, NamedTuple, Optional
+
+from fastapi import Request, Response
+
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime]  # naive UTC, like the rest of the app
+    cache_control: str
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {"ETag": self.etag, "Cache-Control": self.cache_control}
+        if self.last_modified:
+            headers["Last-Modified"] = http_date(self.last_modified)
+        return headers
+
+
+def weak_etag(*parts) -> str:
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 specifies for this header)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    """If-None-Match wins; If-Modified-Since is only consulted without it."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, validators.etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since or not validators.last_modified:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have whole-second precision
+    modified = validators.last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+    return modified <= since
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """304 carrying the validators and caching headers the full response would have had."""
+    return Response(status_code=304, headers=headers)
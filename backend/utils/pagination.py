@@ -0,0 +1,96 @@
+# utils/pagination.py
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is an opaque, URL-safe token holding the sort key and `id` of the
+last document on the previous page. The next page is fetched with a range
+query on the (sort key, id) pair, so deep pages cost the same as page one.
+"""
+import base64
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Response, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def encode_cursor(value: Any, doc_id: str) -> str:
+    if isinstance(value, datetime):
+        payload = {"t": "dt", "v": value.isoformat(), "id": doc_id}
+    else:
+        payload = {"t": "s", "v": value, "id": doc_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value = payload["v"]
+        if payload["t"] == "dt":
+            value = datetime.fromisoformat(value)
+        return value, payload["id"]
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def keyset_query(query: Dict[str, Any], field: str, descending: bool, cursor: Optional[str]) -> Dict[str, Any]:
+    """Restrict `query` to documents after `cursor` in (field, id) order."""
+    if not cursor:
+        return query
+    value, doc_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    after = {"$or": [
+        {field: {op: value}},
+        {field: value, "id": {op: doc_id}},
+    ]}
+    return {"$and": [query, after]} if query else after
+
+
+def keyset_sort(field: str, descending: bool) -> list:
+    direction = -1 if descending else 1
+    return [(field, direction), ("id", direction)]
+
+
+def set_page_headers(response: Response, docs: list, limit: int, field: str, total: Optional[int] = None) -> Optional[str]:
+    """Attach the next cursor (if the page is full) and the optional total to the response."""
+    next_cursor = None
+    if len(docs) == limit:
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(field), last["id"])
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if total is not None:
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+    return next_cursor
+
+
+class CountCache:
+    """Short-lived cache of filtered counts; unfiltered counts use collection metadata."""
+
+    def __init__(self, ttl_seconds: int = 30, max_size: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: Dict[str, Tuple[float, int]] = {}
+
+    async def count(self, collection, query: Dict[str, Any]) -> int:
+        if not query:
+            return await collection.estimated_document_count()
+
+        key = f"{collection.name}:{json.dumps(query, sort_keys=True, default=str)}"
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        total = await collection.count_documents(query)
+        if len(self._entries) >= self.max_size:
+            self._entries.clear()
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, total)
+        return total
+
+
+count_cache = CountCache()
@@ -1,25 +1,43 @@
 import os
+import asyncio
+import json
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-from jinja2 import Environment, FileSystemLoader
-from weasyprint import HTML
 from io import BytesIO
 import logging
 from bson.decimal128 import Decimal128
 from bson.objectid import ObjectId
+from core.config import settings
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# WeasyPrint (with its cairo/pango/font stack) is imported inside PDFGenerator,
+# so only the render processes pay for it - the API workers that import this
+# module for `render_pool` never load it. Jinja is imported there too, but API
+# workers load it anyway: fastapi_cache.coder imports starlette.templating,
+# which imports jinja2 when it is installed. It is cheap next to WeasyPrint.
 logger = logging.getLogger(__name__)
 
+SALES_TEMPLATE = "reports/sales_report.html"
+INVENTORY_TEMPLATE = "reports/inventory_report.html"
+
 
 class PDFGenerator:
     """
     A utility class for generating professional PDF reports
     with Philippine Peso formatting and safe data processing.
+
+    Building one is the expensive part (template compilation, stylesheet and
+    web-font loading), so render processes share one through `get_generator()`.
+    Each report template has a sibling .css stylesheet that is parsed once here.
     """
 
+    TEMPLATES = (SALES_TEMPLATE, INVENTORY_TEMPLATE)
+
     def __init__(self):
         # Base dir (project root)
         self.base_dir = Path(__file__).parent.parent
@@ -29,9 +47,33 @@ class PDFGenerator:
         self.static_dir = self.base_dir / "static"
         self.template_static_dir = self.template_dir / "reports"
 
-        # Setup Jinja environment with peso filter
-        self.env = Environment(loader=FileSystemLoader(str(self.template_dir)))
+        # Setup Jinja environment with peso filter. Templates don't change while
+        # the process runs, so skip the per-render mtime check; compiled bytecode
+        # is shared on disk so new render processes skip the compile step too.
+        from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+        bytecode_cache = None
+        if settings.PDF_TEMPLATE_CACHE_DIR:
+            os.makedirs(settings.PDF_TEMPLATE_CACHE_DIR, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(settings.PDF_TEMPLATE_CACHE_DIR)
+        self.env = Environment(
+            loader=FileSystemLoader(str(self.template_dir)),
+            bytecode_cache=bytecode_cache,
+            auto_reload=False,
+        )
         self.env.filters["php"] = self._format_php_currency
+        self.templates = {name: self.env.get_template(name) for name in self.TEMPLATES}
+
+        # Stylesheets are parsed (and their @import / @font-face fonts fetched) once
+        from weasyprint import CSS
+        from weasyprint.text.fonts import FontConfiguration
+
+        self.font_config = FontConfiguration()
+        self.stylesheets = {
+            name: CSS(filename=str((self.template_dir / name).with_suffix(".css")), font_config=self.font_config)
+            for name in self.TEMPLATES
+        }
+        self._logo_urls: Dict[str, Optional[str]] = {}
 
     # -------------------------------
     # SALES REPORT
@@ -59,8 +101,8 @@ class PDFGenerator:
                 "year": datetime.now().year,
             }
 
-            html_content = self._render_template("reports/sales_report.html", template_data)
-            return self._generate_pdf(html_content)
+            html_content = self._render_template(SALES_TEMPLATE, template_data)
+            return self._generate_pdf(html_content, SALES_TEMPLATE)
 
         except Exception as e:
             logger.error(f"Failed to generate sales report PDF: {str(e)}")
@@ -89,8 +131,8 @@ class PDFGenerator:
                 "year": datetime.now().year,
             }
 
-            html_content = self._render_template("reports/inventory_report.html", template_data)
-            return self._generate_pdf(html_content)
+            html_content = self._render_template(INVENTORY_TEMPLATE, template_data)
+            return self._generate_pdf(html_content, INVENTORY_TEMPLATE)
 
         except Exception as e:
             logger.error(f"Failed to generate inventory PDF: {str(e)}")
@@ -100,10 +142,15 @@ class PDFGenerator:
     # HELPERS
     # -------------------------------
     def _get_logo_url(self, logo_filename: Optional[str]) -> Optional[str]:
-        """Get absolute file URL for logo (search in static/ then templates/reports/)"""
+        """Get absolute file URL for logo (resolved once per filename)"""
         if not logo_filename:
             return None
+        if logo_filename not in self._logo_urls:
+            self._logo_urls[logo_filename] = self._find_logo(logo_filename)
+        return self._logo_urls[logo_filename]
 
+    def _find_logo(self, logo_filename: str) -> Optional[str]:
+        """Search in static/ then templates/reports/"""
         # Primary path: static/
         logo_path = self.static_dir / logo_filename
         if logo_path.exists():
@@ -124,6 +171,9 @@ class PDFGenerator:
             try:
                 price = self._to_float(p.get("price", 0))
                 stock = int(p.get("stock", 0))
+                reorder_level = p.get("reorder_level")
+                if reorder_level is None:
+                    reorder_level = settings.DEFAULT_REORDER_LEVEL
                 processed.append({
                     "name": str(p.get("name", "N/A")),
                     "description": str(p.get("description", "N/A")),
@@ -131,7 +181,7 @@ class PDFGenerator:
                     "price_raw": price,
                     "stock": stock,
                     "is_active": bool(p.get("is_active", True)),
-                    "low_stock": stock <= 5,
+                    "low_stock": stock <= int(reorder_level),
                 })
             except Exception as e:
                 logger.warning(f"Skipping malformed product: {str(e)}")
@@ -158,13 +208,20 @@ class PDFGenerator:
 
     def _render_template(self, template_name: str, data: Dict[str, Any]) -> str:
         """Render HTML template with provided data"""
-        template = self.env.get_template(template_name)
+        template = self.templates.get(template_name) or self.env.get_template(template_name)
         return template.render(**data)
 
-    def _generate_pdf(self, html_content: str) -> bytes:
-        """Generate PDF from HTML content"""
+    def _generate_pdf(self, html_content: str, template_name: Optional[str] = None) -> bytes:
+        """Generate PDF from HTML content, styled with the template's cached stylesheet"""
+        from weasyprint import HTML
+
+        stylesheet = self.stylesheets.get(template_name)
         pdf_file = BytesIO()
-        HTML(string=html_content).write_pdf(pdf_file)
+        HTML(string=html_content).write_pdf(
+            pdf_file,
+            stylesheets=[stylesheet] if stylesheet else None,
+            font_config=self.font_config,
+        )
         return pdf_file.getvalue()
 
     # -------------------------------
@@ -218,8 +275,210 @@ class PDFGenerator:
 # -------------------------------
 # Convenience wrappers
 # -------------------------------
+_generator: Optional[PDFGenerator] = None
+
+
+def get_generator() -> PDFGenerator:
+    """The process-wide generator, built on first use."""
+    global _generator
+    if _generator is None:
+        _generator = PDFGenerator()
+    return _generator
+
+
 def generate_sales_report_pdf(*args, **kwargs) -> bytes:
-    return PDFGenerator().generate_sales_report(*args, **kwargs)
+    return get_generator().generate_sales_report(*args, **kwargs)
 
 def generate_inventory_report_pdf(*args, **kwargs) -> bytes:
-    return PDFGenerator().generate_inventory_report(*args, **kwargs)
+    return get_generator().generate_inventory_report(*args, **kwargs)
+
+
+# -------------------------------
+# Off-event-loop rendering
+# -------------------------------
+class RenderQueueFull(Exception):
+    """Raised when the render pool already holds the maximum number of pending renders."""
+
+
+_RENDERERS = {
+    "sales": generate_sales_report_pdf,
+    "inventory": generate_inventory_report_pdf,
+}
+
+
+def _render(kind: str, args: tuple, kwargs: dict) -> bytes:
+    """Runs inside a pool worker process."""
+    return _RENDERERS[kind](*args, **kwargs)
+
+
+def _warm() -> None:
+    """Runs inside a pool worker process: load templates and fonts before the first real report."""
+    get_generator()._generate_pdf("<p>warm-up</p>", SALES_TEMPLATE)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write via a temp file and rename, so other workers never read a partial file."""
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class PDFRenderPool:
+    """
+    Renders reports in a process pool so WeasyPrint never blocks the event loop.
+
+    `render()` awaits a PDF directly; `submit()` starts a background job that
+    can be polled with `get()` and downloaded from `result_path()`. Job records
+    and finished PDFs are kept in `job_dir`, so with several API workers any of
+    them can answer for a job another one started. At most `max_pending`
+    renders are queued or running at once in each worker.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, job_ttl_seconds: int, job_dir: str):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.job_ttl_seconds = job_ttl_seconds
+        self.job_dir = Path(job_dir)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._tasks = set()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: never fork a process that already runs Motor's threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def warm(self) -> None:
+        """Start every render process and load templates and fonts in each. Never raises."""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            await asyncio.gather(*(loop.run_in_executor(executor, _warm) for _ in range(self.max_workers)))
+        except Exception:
+            logger.exception("PDF renderer warm-up failed; reports will start cold")
+
+    def _reserve(self) -> None:
+        if self._pending >= self.max_pending:
+            raise RenderQueueFull(f"{self._pending} reports already rendering")
+        self._pending += 1
+
+    async def _execute(self, kind: str, args: tuple, kwargs: dict) -> bytes:
+        if self._executor is None:
+            # First report since startup (or since the pool broke): bring the other
+            # render processes up alongside it instead of one cold start per report
+            self._track(asyncio.create_task(self.warm()))
+        executor = self._get_executor()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, _render, kind, args, kwargs)
+        except BrokenProcessPool:
+            # A render process died (OOM kill, WeasyPrint crash): the pool is unusable
+            # from now on, so drop it and let the next render start a fresh one
+            logger.error("PDF render process died; restarting the render pool")
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            self._pending -= 1
+
+    async def render(self, kind: str, *args, **kwargs) -> bytes:
+        """Render a report in the pool and return the PDF bytes."""
+        self._reserve()
+        return await self._execute(kind, args, kwargs)
+
+    # Background jobs
+    def _record_path(self, job_id: str) -> Path:
+        return self.job_dir / f"{job_id}.json"
+
+    def result_path(self, job_id: str) -> Path:
+        return self.job_dir / f"{job_id}.pdf"
+
+    def _save(self, job: Dict[str, Any]) -> None:
+        _write_atomic(self._record_path(job["id"]), json.dumps(job).encode())
+
+    def submit(self, kind: str, owner_id: str, filename: str, *args, **kwargs) -> Dict[str, Any]:
+        """Queue a render and return its job record immediately."""
+        self._prune()
+        self._reserve()
+        job = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "owner_id": owner_id,
+            "filename": filename,
+            "status": "pending",
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        try:
+            self.job_dir.mkdir(parents=True, exist_ok=True)
+            self._save(job)
+        except BaseException:
+            self._pending -= 1  # the job never started, give its slot back
+            raise
+        self._track(asyncio.create_task(self._run_job(job, args, kwargs)))
+        return job
+
+    def _track(self, task: asyncio.Task) -> None:
+        """Keep a reference to a background task until it finishes."""
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_job(self, job: Dict[str, Any], args: tuple, kwargs: dict) -> None:
+        try:
+            content = await self._execute(job["kind"], args, kwargs)
+            await asyncio.to_thread(_write_atomic, self.result_path(job["id"]), content)
+            job["status"] = "done"
+        except Exception as e:
+            logger.error(f"Report job {job['id']} failed: {str(e)}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        job["finished_at"] = time.time()
+        self._save(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            uuid.UUID(job_id)  # never build paths from arbitrary input
+            return json.loads(self._record_path(job_id).read_bytes())
+        except (ValueError, OSError):
+            return None
+
+    def _prune(self) -> None:
+        """Drop job records and PDFs older than the TTL (pending ones after twice the TTL)."""
+        now = time.time()
+        if not self.job_dir.is_dir():
+            return
+        for path in self.job_dir.glob("*.json"):
+            try:
+                job = json.loads(path.read_bytes())
+            except (ValueError, OSError):
+                continue
+            finished_at = job.get("finished_at")
+            expired = (
+                finished_at is not None and finished_at < now - self.job_ttl_seconds
+                or finished_at is None and job.get("created_at", now) < now - 2 * self.job_ttl_seconds
+            )
+            if expired:
+                for stale in (path, self.result_path(job["id"])):
+                    try:
+                        stale.unlink()
+                    except FileNotFoundError:
+                        pass
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+render_pool = PDFRenderPool(
+    max_workers=settings.PDF_RENDER_WORKERS,
+    max_pending=settings.PDF_RENDER_MAX_PENDING,
+    job_ttl_seconds=settings.PDF_JOB_TTL_SECONDS,
+    job_dir=settings.PDF_JOB_DIR,
+)
@@ -0,0 +1,62 @@
+# utils/serialization.py
+"""
+Fast list serialization for hot endpoints.
+
+`fields=` query values become Mongo projections, the fetched documents are
+validated once through a cached `TypeAdapter(List[Model])`, and the result is
+encoded with orjson. Handlers return the response directly, so FastAPI does not
+validate the items a second time through `response_model`.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from fastapi import HTTPException, status
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, TypeAdapter, create_model
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """Validate a comma-separated `fields` value against the model. None means all fields."""
+    if not fields:
+        return None
+    requested = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in model.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    return requested or None
+
+
+def projection_for(
+    selected: Optional[Tuple[str, ...]],
+    always: Iterable[str] = ("id",),
+    exclude: Iterable[str] = (),
+) -> Dict[str, int]:
+    """Mongo projection for the selected fields (plus `always`, e.g. paging keys)."""
+    if selected is None:
+        projection = {f: 0 for f in exclude}
+        projection["_id"] = 0
+        return projection
+    projection = {f: 1 for f in (*selected, *always)}
+    projection["_id"] = 0
+    return projection
+
+
+@lru_cache(maxsize=128)
+def list_adapter(model: Type[BaseModel], selected: Optional[Tuple[str, ...]] = None) -> TypeAdapter:
+    """TypeAdapter for a list of `model`, or of a model limited to `selected` fields."""
+    if selected is not None:
+        model = create_model(
+            f"{model.__name__}Fields",
+            **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in selected},
+        )
+    return TypeAdapter(List[model])
+
+
+def list_response(docs: List[Dict[str, Any]], model: Type[BaseModel], selected: Optional[Tuple[str, ...]] = None) -> ORJSONResponse:
+    """Validate `docs` once and encode them with orjson."""
+    adapter = list_adapter(model, selected)
+    items = adapter.validate_python(docs)
+    return ORJSONResponse(adapter.dump_python(items, mode="json"))
@@ -0,0 +1,56 @@
+# utils/sse.py
+"""
+Server-Sent Events responses fed from an event subscription.
+
+`subscription` is an async context manager yielding an asyncio queue (e.g.
+`services.events.hub.subscribe(...)`); it is entered when streaming starts and
+exited when the client goes away. `initial`, if given, is awaited after
+subscribing (so nothing published in between is lost) and its items are sent
+first. Each queued item is
+{"type": ..., "payload": ...} and is sent as one SSE message with
+`event: <type>`. A comment line goes out every `heartbeat` seconds so proxies
+keep idle connections open and disconnected clients are noticed.
+"""
+import asyncio
+from typing import AsyncContextManager, AsyncIterator, Awaitable, Callable, List, Optional
+
+import orjson
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+HEARTBEAT_SECONDS = 15.0
+
+
+def format_event(type: str, data) -> bytes:
+    return b"event: " + type.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+InitialItems = Optional[Callable[[], Awaitable[List[dict]]]]
+
+
+async def _stream(request: Request, subscription: AsyncContextManager, initial: InitialItems, heartbeat: float) -> AsyncIterator[bytes]:
+    async with subscription as queue:
+        for item in (await initial() if initial else ()):
+            yield format_event(item["type"], item["payload"])
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield b": keep-alive\n\n"
+                continue
+            yield format_event(item["type"], item["payload"])
+
+
+def sse_response(
+    request: Request,
+    subscription: AsyncContextManager,
+    initial: InitialItems = None,
+    heartbeat: float = HEARTBEAT_SECONDS,
+) -> StreamingResponse:
+    return StreamingResponse(
+        _stream(request, subscription, initial, heartbeat),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -16,3 +16,58 @@ export const fetchDashboardData = async (period = 'week') => {
 
   return res.data;
 };
+
+// Short-lived, stream-only token: EventSource cannot send headers, so the token
+// goes in the URL, and the long-lived login token must never end up there.
+const fetchStreamToken = async () => {
+  const token = localStorage.getItem('token');
+  const res = await axios.post(`${API_BASE}/auth/stream-token`, null, {
+    headers: { Authorization: token ? `Bearer ${token}` : undefined }
+  });
+  return res.data.stream_token;
+};
+
+const RECONNECT_DELAY_MS = 3000;
+
+// Live updates over Server-Sent Events. Returns a function that closes the stream.
+// Stream tokens expire quickly, so a dropped stream is reopened with a fresh one.
+export const subscribeDashboard = (period = 'week', { onSnapshot, onDelta }) => {
+  let source = null;
+  let retryTimer = null;
+  let closed = false;
+
+  const retry = () => {
+    if (!closed) retryTimer = setTimeout(open, RECONNECT_DELAY_MS);
+  };
+
+  async function open() {
+    let streamToken;
+    try {
+      streamToken = await fetchStreamToken();
+    } catch (err) {
+      retry();
+      return;
+    }
+    if (closed) return;
+
+    const params = new URLSearchParams({ period, stream_token: streamToken });
+    source = new EventSource(`${API_BASE}/dashboard/stream?${params}`);
+    source.addEventListener('snapshot', (e) => onSnapshot(JSON.parse(e.data)));
+    source.addEventListener('delta', (e) => onDelta(JSON.parse(e.data)));
+    source.onerror = () => {
+      // The browser retries on its own with the same (by now possibly expired) URL;
+      // once it gives up, start over with a new token
+      if (source.readyState === EventSource.CLOSED) {
+        source.close();
+        retry();
+      }
+    };
+  }
+
+  open();
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    if (source) source.close();
+  };
+};
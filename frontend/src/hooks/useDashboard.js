@@ -1,9 +1,35 @@
 // src/hooks/useDashboard.js
-import { useQuery } from '@tanstack/react-query';
-import { fetchDashboardData } from '../api/dashboard';
+import { useEffect } from 'react';
+import { useQuery, useQueryClient } from '@tanstack/react-query';
+import { fetchDashboardData, subscribeDashboard } from '../api/dashboard';
+
+// Merge a streamed delta into the cached summary
+function applyDelta(data, delta) {
+  if (!data) return data;
+  const next = { ...data };
+  if (delta.totals) next.orders = delta.totals;
+  if (delta.products) next.products = delta.products;
+  if (delta.bucket) {
+    const trend = (data.sales_trend || []).filter((b) => b.date !== delta.bucket.date);
+    if (delta.bucket.orders > 0) trend.push(delta.bucket);
+    trend.sort((a, b) => a.date.localeCompare(b.date));
+    next.sales_trend = trend;
+  }
+  return next;
+}
 
 // defaultPeriod can be 'week' | 'month' | 'year' | 'all'
 export function useDashboard(period = 'week') {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    const queryKey = ['dashboard', period];
+    return subscribeDashboard(period, {
+      onSnapshot: (summary) => queryClient.setQueryData(queryKey, summary),
+      onDelta: (delta) => queryClient.setQueryData(queryKey, (data) => applyDelta(data, delta))
+    });
+  }, [period, queryClient]);
+
   return useQuery({
     queryKey: ['dashboard', period],
     queryFn: () => fetchDashboardData(period),